@@ -0,0 +1,44 @@
+"""
+Fixed discrete action space shared by the environment, game records and bots.
+
+    0-53     settle vertex i
+    54-125   build road on edge j
+    126      end turn
+"""
+
+from enum import Enum
+from typing import Tuple
+from topology import NUM_EDGES, NUM_VERTICES
+
+
+class ActionType(Enum):
+    SETTLE = 0
+    ROAD = 1
+    END_TURN = 2
+
+
+SETTLE_OFFSET = 0
+ROAD_OFFSET = SETTLE_OFFSET + NUM_VERTICES
+END_TURN = ROAD_OFFSET + NUM_EDGES
+NUM_ACTIONS = END_TURN + 1
+
+
+def settle_action(vertex_id: int) -> int:
+    return SETTLE_OFFSET + vertex_id
+
+
+def road_action(edge_id: int) -> int:
+    return ROAD_OFFSET + edge_id
+
+
+def decode_action(action: int) -> Tuple[ActionType, int]:
+    """
+    Split an action into its type and the vertex or edge id it applies to
+    """
+    if not 0 <= action < NUM_ACTIONS:
+        raise ValueError(f"Action {action} is outside of the action space")
+    if action >= END_TURN:
+        return ActionType.END_TURN, 0
+    if action >= ROAD_OFFSET:
+        return ActionType.ROAD, action - ROAD_OFFSET
+    return ActionType.SETTLE, action - SETTLE_OFFSET
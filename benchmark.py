@@ -0,0 +1,250 @@
+"""
+Reproducible micro and end-to-end benchmarks.
+
+Every benchmark runs a fixed number of operations on inputs built from fixed seeds,
+so two runs on the same machine do the same work. Each one reports operations per
+second (the median and best of several repeats) and the peak memory allocated per
+operation, measured by tracemalloc in a separate pass so it doesn't skew the timing.
+Results are written as JSON, and --compare prints the change against an earlier
+results file.
+
+Example:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from board import Board
+from game import Game
+from layout import LayoutGenerator
+
+SEED = 1234
+# Click positions are drawn from the window the game opens
+SCREEN_SIZE = (1100, 800)
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # Builds the operation to time, so setup cost never ends up in the results
+    setup: Callable[[], Callable[[], Any]]
+    ops: int
+
+
+def _mid_game_game() -> Game:
+    # Four settlements and roads in, the settleable set is partly blocked
+    game = Game(headless=True, seed=SEED)
+    for _ in range(4):
+        game.computer_settlement_phase(game.players[game.current_player_index])
+    return game
+
+
+def _clicks(n: int) -> List[tuple]:
+    rng = random.Random(SEED)
+    return [
+        (rng.uniform(0, SCREEN_SIZE[0]), rng.uniform(0, SCREEN_SIZE[1]))
+        for _ in range(n)
+    ]
+
+
+def _cycle(op: Callable[[Any], Any], items: List[Any]) -> Callable[[], Any]:
+    # Call op on the next item each time, wrapping around
+    index = 0
+
+    def run() -> Any:
+        nonlocal index
+        item = items[index]
+        index = (index + 1) % len(items)
+        return op(item)
+
+    return run
+
+
+def setup_layout_generation() -> Callable[[], Any]:
+    return LayoutGenerator(seed=SEED).generate
+
+
+def setup_board_generation() -> Callable[[], Any]:
+    rng = random.Random(SEED)
+    return lambda: Board(rng=rng)
+
+
+def setup_settleable_vertices() -> Callable[[], Any]:
+    return _mid_game_game().board.get_list_of_settleable_vertices
+
+
+def setup_legal_actions() -> Callable[[], Any]:
+    return _mid_game_game().get_legal_actions
+
+
+def setup_road_moves() -> Callable[[], Any]:
+    # Roads connected to a player's network, the check needed after setup
+    game = _mid_game_game()
+    return lambda: game.board.bitboard.road_moves(game.current_player_index)
+
+
+def setup_tile_collision() -> Callable[[], Any]:
+    return _cycle(_mid_game_game().board.check_collision, _clicks(1024))
+
+
+def setup_vertex_collision() -> Callable[[], Any]:
+    return _cycle(_mid_game_game().board.check_if_vertex_collision, _clicks(1024))
+
+
+def setup_edge_collision() -> Callable[[], Any]:
+    game = _mid_game_game()
+    player = game.players[game.current_player_index]
+
+    def check(click) -> Any:
+        return game.board.check_if_edge_collision(click, player, game.game_phase)
+
+    return _cycle(check, _clicks(1024))
+
+
+def setup_headless_game() -> Callable[[], Any]:
+    # One op is a whole game: board generation plus the full settlement phase
+    rng = random.Random(SEED)
+    return lambda: Game(headless=True, seed=rng.getrandbits(64)).run_headless()
+
+
+BENCHMARKS = [
+    Benchmark("layout_generation", setup_layout_generation, 20000),
+    Benchmark("board_generation", setup_board_generation, 2000),
+    Benchmark("settleable_vertices", setup_settleable_vertices, 50000),
+    Benchmark("legal_actions", setup_legal_actions, 50000),
+    Benchmark("road_moves", setup_road_moves, 50000),
+    Benchmark("tile_collision", setup_tile_collision, 50000),
+    Benchmark("vertex_collision", setup_vertex_collision, 50000),
+    Benchmark("edge_collision", setup_edge_collision, 50000),
+    Benchmark("headless_game", setup_headless_game, 500),
+]
+
+
+def time_ops(op: Callable[[], Any], ops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(ops):
+        op()
+    return time.perf_counter() - start
+
+
+def peak_bytes_per_op(op: Callable[[], Any], ops: int) -> float:
+    # Highest memory in use above the starting point, averaged over single ops
+    total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(ops):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            op()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+    finally:
+        tracemalloc.stop()
+
+    return total / ops
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int, scale: float) -> Dict[str, Any]:
+    ops = max(1, int(benchmark.ops * scale))
+    rates = []
+    for _ in range(repeat):
+        # A fresh setup per repeat, so every repeat does exactly the same work
+        rates.append(ops / time_ops(benchmark.setup(), ops))
+
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "ops_per_sec": statistics.median(rates),
+        "best_ops_per_sec": max(rates),
+        "peak_bytes_per_op": peak_bytes_per_op(
+            benchmark.setup(), max(1, min(ops, 200))
+        ),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            # The commit of this checkout, wherever the benchmarks are run from
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\nagainst {baseline.get('commit')}:")
+    for name, result in results["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            print(f"{name:>20}: new")
+            continue
+        speed = result["ops_per_sec"] / old["ops_per_sec"] - 1
+        memory = result["peak_bytes_per_op"] - old["peak_bytes_per_op"]
+        print(f"{name:>20}: {speed:+7.1%} ops/sec, {memory:+10.0f} peak bytes/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the Catan engine benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply every benchmark's operation count, lower it for a quick run",
+    )
+    parser.add_argument(
+        "--only",
+        help="Comma separated benchmark names, all of them by default: "
+        + ", ".join(benchmark.name for benchmark in BENCHMARKS),
+    )
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    benchmarks = BENCHMARKS
+    if args.only:
+        names = args.only.split(",")
+        unknown = set(names) - {benchmark.name for benchmark in BENCHMARKS}
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+        benchmarks = [benchmark for benchmark in BENCHMARKS if benchmark.name in names]
+
+    results: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "benchmarks": {},
+    }
+    for benchmark in benchmarks:
+        result = run_benchmark(benchmark, args.repeat, args.scale)
+        results["benchmarks"][benchmark.name] = result
+        print(
+            f"{benchmark.name:>20}: {result['ops_per_sec']:12.1f} ops/sec, "
+            f"{result['peak_bytes_per_op']:10.0f} peak bytes/op"
+        )
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
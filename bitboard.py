@@ -0,0 +1,175 @@
+"""
+Bitboard move generation.
+
+Vertices and edges are bits of plain Python ints, bit i for vertex or edge id i,
+so the 54 vertices and 72 edges of the board each fit in one integer. Board keeps
+a Bitboard in step with its buildings and roads, and legality becomes a handful of
+AND/OR/NOT operations instead of walking Vertex and Edge objects:
+
+    settleable      no building on the vertex or any neighbor (the distance rule)
+    setup roads     open edges off the settlement just placed
+    main roads      open edges touching a vertex of the player's network, that is
+                    one of their buildings or the end of one of their roads that no
+                    opponent has built on
+    main settling   settleable vertices at the end of one of the player's roads
+
+The hex graph isn't a grid, so neighbors can't come from shifts. Spreading a whole
+mask to its neighbors (or incident edges, or edge ends) instead goes through one
+256 entry table per byte of the mask, which is at most nine lookups no matter how
+many bits are set.
+"""
+
+from typing import List, Sequence, Tuple
+from topology import (
+    EDGE_VERTICES,
+    NUM_EDGES,
+    NUM_VERTICES,
+    VERTEX_BLOCK_MASKS,
+    VERTEX_EDGES,
+    VERTEX_NEIGHBORS,
+)
+
+NUM_PLAYERS = 4
+ALL_VERTICES = (1 << NUM_VERTICES) - 1
+ALL_EDGES = (1 << NUM_EDGES) - 1
+
+# Per vertex: its neighbors, and the edges touching it
+VERTEX_NEIGHBOR_MASKS: Tuple[int, ...] = tuple(
+    sum(1 << neighbor for neighbor in neighbors) for neighbors in VERTEX_NEIGHBORS
+)
+VERTEX_EDGE_MASKS: Tuple[int, ...] = tuple(
+    sum(1 << edge for edge in edges) for edges in VERTEX_EDGES
+)
+# Per edge: its two end vertices, and the other edges sharing one of them
+EDGE_VERTEX_MASKS: Tuple[int, ...] = tuple(
+    (1 << a) | (1 << b) for a, b in EDGE_VERTICES
+)
+EDGE_NEIGHBOR_MASKS: Tuple[int, ...] = tuple(
+    (VERTEX_EDGE_MASKS[a] | VERTEX_EDGE_MASKS[b]) & ~(1 << edge)
+    for edge, (a, b) in enumerate(EDGE_VERTICES)
+)
+
+
+def _byte_tables(masks: Sequence[int]) -> Tuple[Tuple[int, ...], ...]:
+    """
+    For each byte of a bitboard indexing masks, the OR of masks[i] over the set
+    bits i of every possible value of that byte
+    """
+    tables = []
+    for shift in range(0, len(masks), 8):
+        table = [0] * 256
+        for value in range(1, 256):
+            lowest_bit = value & -value
+            bit = shift + lowest_bit.bit_length() - 1
+            table[value] = table[value ^ lowest_bit] | (
+                masks[bit] if bit < len(masks) else 0
+            )
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+def _spread(mask: int, tables: Tuple[Tuple[int, ...], ...]) -> int:
+    result = 0
+    for table in tables:
+        if not mask:
+            break
+        result |= table[mask & 0xFF]
+        mask >>= 8
+    return result
+
+
+# Ids of the set bits of every byte value, per byte of a bitboard
+_ID_TABLES: Tuple[Tuple[Tuple[int, ...], ...], ...] = tuple(
+    tuple(
+        tuple(shift + bit for bit in range(8) if value >> bit & 1)
+        for value in range(256)
+    )
+    for shift in range(0, max(NUM_VERTICES, NUM_EDGES), 8)
+)
+_BLOCK_TABLES = _byte_tables(VERTEX_BLOCK_MASKS)
+_VERTEX_EDGE_TABLES = _byte_tables(VERTEX_EDGE_MASKS)
+_EDGE_VERTEX_TABLES = _byte_tables(EDGE_VERTEX_MASKS)
+
+
+def blocked_vertices(buildings: int) -> int:
+    # Vertices the distance rule rules out, the buildings and all their neighbors
+    return _spread(buildings, _BLOCK_TABLES)
+
+
+def edges_touching(vertices: int) -> int:
+    return _spread(vertices, _VERTEX_EDGE_TABLES)
+
+
+def edge_ends(edges: int) -> int:
+    return _spread(edges, _EDGE_VERTEX_TABLES)
+
+
+def bit_ids(mask: int) -> List[int]:
+    # Ids of the set bits of a vertex or edge bitboard, lowest first
+    ids: List[int] = []
+    for table in _ID_TABLES:
+        if not mask:
+            break
+        ids += table[mask & 0xFF]
+        mask >>= 8
+    return ids
+
+
+class Bitboard:
+    __slots__ = ("buildings", "roads")
+
+    def __init__(self):
+        # Per player index (player id - 1): vertices built on and edges with a road
+        self.buildings: List[int] = [0] * NUM_PLAYERS
+        self.roads: List[int] = [0] * NUM_PLAYERS
+
+    def add_settlement(self, player: int, vertex: int) -> None:
+        self.buildings[player] |= 1 << vertex
+
+    def remove_settlement(self, player: int, vertex: int) -> None:
+        self.buildings[player] &= ~(1 << vertex)
+
+    def add_road(self, player: int, edge: int) -> None:
+        self.roads[player] |= 1 << edge
+
+    def remove_road(self, player: int, edge: int) -> None:
+        self.roads[player] &= ~(1 << edge)
+
+    @property
+    def occupied(self) -> int:
+        buildings = self.buildings
+        return buildings[0] | buildings[1] | buildings[2] | buildings[3]
+
+    @property
+    def built_roads(self) -> int:
+        roads = self.roads
+        return roads[0] | roads[1] | roads[2] | roads[3]
+
+    def settleable(self) -> int:
+        return ALL_VERTICES & ~blocked_vertices(self.occupied)
+
+    def can_settle(self, vertex: int) -> bool:
+        return not self.occupied & VERTEX_BLOCK_MASKS[vertex]
+
+    def setup_road_moves(self, vertex: int) -> int:
+        # Setup roads have to come off the settlement just placed
+        return VERTEX_EDGE_MASKS[vertex] & ~self.built_roads
+
+    def network(self, player: int) -> int:
+        """
+        Vertices the player can build a road from: their own buildings, and ends of
+        their roads not cut off by an opponent's building
+        """
+        own = self.buildings[player]
+        opponents = self.occupied & ~own
+        return own | (edge_ends(self.roads[player]) & ~opponents)
+
+    def road_moves(self, player: int) -> int:
+        return edges_touching(self.network(player)) & ~self.built_roads
+
+    def can_build_road(self, player: int, edge: int) -> bool:
+        return bool(self.road_moves(player) >> edge & 1)
+
+    def settlement_moves(self, player: int) -> int:
+        # After setup, settlements also have to be on one of the player's roads
+        return self.settleable() & edge_ends(self.roads[player])
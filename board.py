@@ -1,176 +1,202 @@
 from __future__ import annotations
-import math
 import random
-from typing import List, Optional, Set, Tuple
-import pygame
-from constants import (
-    NUMBER_DICT,
-    OFFSET_Q,
-    OFFSET_R,
-    RESOURCE_DICT,
-    Color,
-    Resource,
-)
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from bitboard import Bitboard, bit_ids
+from constants import RESOURCE_IDS
+from features import vertex_features
+from hit_test import EDGE_INDEX, VERTEX_INDEX, tile_at
+from layout import BoardLayout, LayoutGenerator, is_layout_legal
+from longest_road import LongestRoadTracker
 from player import Player
+from profiling import profiled
 from tile import Tile
+from topology import (
+    EDGE_VERTICES,
+    NUM_TILES,
+    NUM_VERTICES,
+    VERTEX_BLOCK_MASKS,
+    VERTEX_NEIGHBORS,
+    VERTEX_TILES,
+)
 from vertex import Vertex
 from edge import Edge
+from zobrist import (
+    CITY_KEYS,
+    ROAD_KEYS,
+    SETTLEMENT_KEYS,
+    card_count_key,
+    layout_hash,
+)
+
+ALL_VERTICES_MASK = (1 << NUM_VERTICES) - 1
+
+
+class ProductionEntry(NamedTuple):
+    tile: Tile
+    vertex: Vertex
+    owner: Player
+    # Cards paid per roll, 1 for a settlement and 2 for a city
+    multiplier: int
 
 
 class Board:
-    def __init__(self, screen):
+    def __init__(
+        self,
+        renderer: Optional["Renderer"] = None,  # type: ignore # noqa: F821
+        layout: Optional[BoardLayout] = None,
+        rng: Optional[random.Random] = None,
+    ):
         self.vertices: List[Vertex] = []
         self.edges: List[Edge] = []
         self.tiles: List[Tile] = []
-        self.screen: pygame.Surface = screen
-        self.generate_new_board()
-
-    @staticmethod
-    def get_random_resource_order() -> List[str]:
-        result: List[str] = []
-        for value, count in RESOURCE_DICT.items():
-            result.extend([value] * count)
-        random.shuffle(result)
-        return result
-
-    @staticmethod
-    def get_random_number_order() -> List[int]:
-        result: List[int] = []
-        for value, count in NUMBER_DICT.items():
-            result.extend([value] * count)
-        random.shuffle(result)
-        return result
-
-    def generate_new_board(self) -> None:
-        # Get random number and tile order
-        while True:
-            resource_order = self.get_random_resource_order()
-            desert_index = resource_order.index(Resource.DESERT.value)
-            number_order = self.get_random_number_order()
-            number_order.insert(desert_index, -1)
-
-            index = 0
-            set_of_vertices: Set[Vertex] = set()
-            self.screen.fill(Color.BACKGROUND.to_rgb())  # Light gray background
-            grid = {}
-            # q is straight across (basically x)
-            # r is angled down (disturbed y)
-            for q in range(0, 5):
-                for r in range(0, 5):
-                    if not (q + r < 2 or q + r > 6):
-                        grid[(q, r)] = 1
-
-            for (q, r), _ in grid.items():
-                new_tile = Tile(
-                    resource_order[index],
-                    q + OFFSET_Q,
-                    r + OFFSET_R,
-                    number_order[index],
-                    set_of_vertices,
-                )
-                self.tiles.append(new_tile)
-                index += 1
-
-            self.vertices = list(set_of_vertices)
-
-            if self.is_board_legal():
-                break
-
-        # Get all edges by looping through vertices
-        for vertex in self.vertices:
-            vertex.find_all_neighbors(self.vertices, self.edges)
+        # Bit i is set while vertex i can still be settled
+        self.settleable_mask: int = ALL_VERTICES_MASK
+        # Buildings and roads as bitboards, for move generation
+        self.bitboard = Bitboard()
+        # Dice number -> (tile id, vertex id) -> what that roll pays out there
+        self.production_index: Dict[int, Dict[Tuple[int, int], ProductionEntry]] = {}
+        self.longest_road = LongestRoadTracker()
+        # Per vertex features of the layout, see features.py
+        self.vertex_features = None
+        # Zobrist hash of the layout, buildings, roads and cards, kept up to date by
+        # every mutation below
+        self.zobrist_hash = 0
+        self.layout_generator = LayoutGenerator(rng=rng)
+        # Rendering is an optional observer, headless boards never draw
+        self.renderer = renderer
+        self.generate_new_board(layout)
+
+    def attach_renderer(self, renderer: "Renderer") -> None:  # type: ignore # noqa: F821
+        self.renderer = renderer
+        renderer.display_board(self)
+
+    @profiled("board.generate")
+    def generate_new_board(self, layout: Optional[BoardLayout] = None) -> None:
+        # Get random number and tile order, generated layouts are always legal
+        if layout is None:
+            layout = self.layout_generator.generate()
+        elif not is_layout_legal(layout.numbers):
+            raise ValueError(
+                "Layout puts two 6/8 or two 2/12 tokens next to each other"
+            )
+        self.layout = layout
 
-        self.vertices: List[Vertex] = sorted(
-            self.vertices,
-            key=lambda obj: (obj.coordinate[1], obj.coordinate[0]),
-        )
-        # Label vertices and ports
-        i: int = 1
+        # Only the layout is new, the graph itself comes from the shared topology
+        self.tiles = [
+            Tile(i, layout.resources[i], layout.numbers[i]) for i in range(NUM_TILES)
+        ]
+        self.vertices = [Vertex(i) for i in range(NUM_VERTICES)]
+        self.edges = [
+            Edge(i, (self.vertices[a], self.vertices[b]))
+            for i, (a, b) in enumerate(EDGE_VERTICES)
+        ]
         for vertex in self.vertices:
-            vertex.label_vertex(i)
-            i += 1
+            # Label vertices and ports
+            vertex.label_vertex(vertex.id + 1)
+            vertex.neighbors = [self.vertices[i] for i in VERTEX_NEIGHBORS[vertex.id]]
+            vertex.tile_association = [self.tiles[i] for i in VERTEX_TILES[vertex.id]]
+        self.settleable_mask = ALL_VERTICES_MASK
+        self.bitboard = Bitboard()
+        self.production_index = {
+            tile.number: {} for tile in self.tiles if tile.number != -1
+        }
+        self.longest_road = LongestRoadTracker()
+        self.zobrist_hash = layout_hash(layout.resources, layout.numbers)
+        self.vertex_features = vertex_features(layout)
 
-        # Check to see if ports are working
         self.display_board()
 
     def display_board(self) -> None:
-        # For showing tiles
-        font = pygame.font.Font(None, 36)
-        for tile in self.tiles:
-            pygame.draw.polygon(self.screen, tile.color, tile.points)
-
-            if tile.number != -1:
-                text_surface = font.render(
-                    str(tile.number), True, Color.OUTLINE.to_rgb()
-                )  # Create text surface
-                text_rect = text_surface.get_rect(
-                    center=(tile.x, tile.y)
-                )  # Center the rectangle
-                self.screen.blit(
-                    text_surface, text_rect.topleft
-                )  # Draw text at adjusted position
-
-        # For showing edges
-        for edge in self.edges:
-            pygame.draw.line(
-                self.screen,
-                Color.EDGE.to_rgb(),
-                edge.vertex_set[0].coordinate,
-                edge.vertex_set[1].coordinate,
-                10,
-            )
-
-        # For showing vertices
-        font = pygame.font.Font(None, 24)
-        for vertex in self.get_list_of_settleable_vertices():
-            pygame.draw.circle(self.screen, Color.VERTEX.to_rgb(), vertex.coordinate, 5)
-
-        pygame.display.flip()
+        if self.renderer:
+            self.renderer.display_board(self)
 
+    @profiled("board.hit_test.tile")
     def check_collision(self, click_position: Tuple[int, int]) -> Optional[Tile]:
         # Return tile if it collides with the click
-        for tile in self.tiles:
-            if pygame.draw.polygon(
-                self.screen, tile.color, tile.points, 0
-            ).collidepoint(click_position):
-                return tile
-
-        # Return None if no collision
-        return None
+        tile_id = tile_at(click_position)
+        if tile_id is None:
+            return None
+        return self.tiles[tile_id]
 
+    @profiled("board.hit_test.vertex")
     def check_if_vertex_collision(
         self, click_position: Tuple[int, int]
     ) -> Optional[Vertex]:
-        mx, my = click_position
-        threshold = 10
-        for vertex in self.vertices:
-            distance = math.sqrt(
-                (mx - vertex.coordinate[0]) ** 2 + (my - vertex.coordinate[1]) ** 2
-            )
-
-            if distance <= threshold and vertex.check_if_can_build_settlement():
+        for vertex_id in VERTEX_INDEX.query(click_position):
+            vertex = self.vertices[vertex_id]
+            if self.is_settleable(vertex):
                 return vertex
 
         return None
 
+    @profiled("board.build_settlement")
     def create_settlement(self, vertex: Vertex, player: Player) -> None:
         vertex.build_settlement(player)
+        self.settleable_mask &= ~VERTEX_BLOCK_MASKS[vertex.id]
+        self.bitboard.add_settlement(player.id - 1, vertex.id)
+        self.update_production_index(vertex)
+        self.longest_road.add_settlement(player.id - 1, vertex.id)
+        self.zobrist_hash ^= SETTLEMENT_KEYS[vertex.id][player.id - 1]
+
+        if self.renderer:
+            self.renderer.draw_settlement(vertex, player)
+
+    @profiled("board.undo_settlement")
+    def undo_settlement(self, vertex: Vertex, settleable_mask: int) -> None:
+        """
+        Take back the last settlement, settleable_mask is the mask from before it was
+        built so nothing has to be rescanned
+        """
+        self.zobrist_hash ^= SETTLEMENT_KEYS[vertex.id][vertex.settlement.id - 1]
+        self.bitboard.remove_settlement(vertex.settlement.id - 1, vertex.id)
+        vertex.settlement = None
+        self.settleable_mask = settleable_mask
+        self.update_production_index(vertex)
+        self.longest_road.remove_settlement(vertex.id)
+
+        # Undo is rare with a renderer attached, so it just redraws everything
+        self.display_board()
 
-        # Draw settlement
-        width, height = 28, 21
-        x, y = vertex.coordinate[0] - width // 2, vertex.coordinate[1] - height // 2
-
-        roof_points = [
-            (x, y),
-            (x + width // 2, y - height // 2),
-            (x + width, y),
-        ]
-
-        pygame.draw.rect(self.screen, player.color, (x, y, width, height))
-        pygame.draw.polygon(self.screen, player.color, roof_points)
-
-        pygame.display.flip()
+    @profiled("board.build_city")
+    def create_city(self, vertex: Vertex, player: Player) -> None:
+        vertex.build_city(player)
+        self.update_production_index(vertex)
+        self.zobrist_hash ^= (
+            SETTLEMENT_KEYS[vertex.id][player.id - 1]
+            ^ CITY_KEYS[vertex.id][player.id - 1]
+        )
 
+        if self.renderer:
+            self.renderer.draw_city(vertex, player)
+
+    def update_production_index(self, vertex: Vertex) -> None:
+        # Re-index the tiles around a vertex whose building just changed
+        for tile in vertex.tile_association:
+            if tile.number == -1:
+                continue
+            entries = self.production_index[tile.number]
+            if vertex.settlement:
+                entries[(tile.id, vertex.id)] = ProductionEntry(
+                    tile, vertex, vertex.settlement, 2 if vertex.is_city else 1
+                )
+            else:
+                entries.pop((tile.id, vertex.id), None)
+
+    @profiled("board.produce")
+    def distribute_resources(self, roll: int) -> None:
+        """
+        Pay every building next to a tile with this number, 7 pays nothing
+        """
+        for entry in self.production_index.get(roll, {}).values():
+            player = entry.owner.id - 1
+            resource = RESOURCE_IDS[entry.tile.resource]
+            count = entry.owner.resources[resource]
+            new_count = count + entry.multiplier
+            entry.owner.resources[resource] = new_count
+            self.zobrist_hash ^= card_count_key(player, resource, count)
+            self.zobrist_hash ^= card_count_key(player, resource, new_count)
+
+    @profiled("board.hit_test.edge")
     def check_if_edge_collision(
         self,
         click_position: Tuple[int, int],
@@ -178,93 +204,58 @@ class Board:
         game_phase: int,
         current_vertex: Optional[Vertex] = None,
     ) -> Optional[Edge]:
-        mx, my = click_position
-        threshold = 10
-        for edge in self.edges:
-            distance = math.sqrt(
-                (
-                    mx
-                    - (
-                        edge.vertex_set[0].coordinate[0]
-                        + edge.vertex_set[1].coordinate[0]
-                    )
-                    / 2
-                )
-                ** 2
-                + (
-                    my
-                    - (
-                        edge.vertex_set[0].coordinate[1]
-                        + edge.vertex_set[1].coordinate[1]
-                    )
-                    / 2
-                )
-                ** 2
-            )
-
-            if distance <= threshold and edge.check_if_can_build_road(
+        for edge_id in EDGE_INDEX.query(click_position):
+            edge = self.edges[edge_id]
+            if edge.check_if_can_build_road(
                 self.edges, player, game_phase, current_vertex
             ):
                 return edge
 
         return None
 
+    @profiled("board.build_road")
     def create_road(self, edge: Edge, player: Player) -> None:
         edge.build_road(player)
+        self.bitboard.add_road(player.id - 1, edge.id)
+        self.longest_road.add_road(player.id - 1, edge.id)
+        self.zobrist_hash ^= ROAD_KEYS[edge.id][player.id - 1]
 
-        pygame.draw.line(
-            self.screen,
-            player.color,
-            edge.vertex_set[0].coordinate,
-            edge.vertex_set[1].coordinate,
-            10,
-        )
+        if self.renderer:
+            self.renderer.draw_road(edge, player)
 
-        pygame.display.flip()
+    @profiled("board.undo_road")
+    def undo_road(self, edge: Edge) -> None:
+        self.longest_road.remove_road(edge.road.id - 1, edge.id)
+        self.zobrist_hash ^= ROAD_KEYS[edge.id][edge.road.id - 1]
+        self.bitboard.remove_road(edge.road.id - 1, edge.id)
+        edge.road = None
 
-    def is_board_legal(self) -> bool:
-        for vertex in self.vertices:
-            counter_6_8 = 0
-            counter_2_12 = 0
-            for tile in vertex.tile_association:
-                if tile.number in [6, 8]:
-                    counter_6_8 += 1
-                if tile.number in [2, 12]:
-                    counter_2_12 += 1
-            if counter_6_8 > 1 or counter_2_12 > 1:
-                return False
-
-        return True
+        self.display_board()
 
-    def get_list_of_settleable_vertices(self) -> List[Vertex]:
-        list_of_vertices: List[Vertex] = []
-        for vertex in self.vertices:
-            if vertex.settlement is None and all(
-                vertex_neighbors.settlement is None
-                for vertex_neighbors in vertex.neighbors
-            ):
-                list_of_vertices.append(vertex)
+    def is_settleable(self, vertex: Vertex) -> bool:
+        return bool(self.settleable_mask >> vertex.id & 1)
 
-        return list_of_vertices
+    @profiled("board.settleable_vertices")
+    def get_list_of_settleable_vertices(self) -> List[Vertex]:
+        # Set bits come lowest first, so vertices stay in id order
+        vertices = self.vertices
+        return [vertices[i] for i in bit_ids(self.settleable_mask)]
 
+    @profiled("board.open_edges")
     def get_list_of_edges_off_vertex(self, vertex) -> List[Edge]:
-        list_of_edges: List[Edge] = []
-        for edge in self.edges:
-            if not edge.road and (
-                edge.vertex_set[0] == vertex or edge.vertex_set[1] == vertex
-            ):
-                list_of_edges.append(edge)
-
-        return list_of_edges
+        edges = self.edges
+        return [edges[i] for i in bit_ids(self.bitboard.setup_road_moves(vertex.id))]
 
-    def redraw_settleable_vertices(self) -> None:
+    def get_expected_production(self) -> List[float]:
+        # Chance per roll that each player's settlements produce, indexed by player id - 1
+        production = [0.0, 0.0, 0.0, 0.0]
         for vertex in self.vertices:
-            if not vertex.settlement:
-                pygame.draw.circle(
-                    self.screen, Color.EDGE.to_rgb(), vertex.coordinate, 5
-                )
+            if vertex.settlement:
+                for tile in vertex.tile_association:
+                    production[vertex.settlement.id - 1] += tile.tile_num_to_prob()
 
-        for vertex in self.get_list_of_settleable_vertices():
-            pygame.draw.circle(self.screen, Color.VERTEX.to_rgb(), vertex.coordinate, 5)
+        return production
 
-        pygame.display.flip()
+    def redraw_settleable_vertices(self) -> None:
+        if self.renderer:
+            self.renderer.redraw_settleable_vertices(self)
@@ -0,0 +1,283 @@
+"""
+Batched policy inference for many games played at once.
+
+Games running in their own threads ask the broker for a decision and block. The
+broker thread gathers pending decisions until it has max_batch of them or the
+oldest has waited max_wait seconds, encodes them into one contiguous observation
+and action mask batch (the vector_state layout) and makes a single vectorized
+policy call. The chosen actions are then handed back to the waiting games.
+
+A batch policy is any callable taking (observations, masks), the
+(batch, OBSERVATION_SIZE) int8 observations and (batch, NUM_ACTIONS) bool legal
+action masks, and returning one action id per row. ArrayHeuristic is
+HeuristicPolicy in that form, a trained model only needs a wrapper with the
+same signature.
+
+Example:
+    python broker.py --games 2000 --threads 64 --max-batch 64 --max-wait-ms 2
+"""
+
+import argparse
+import importlib
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from actions import NUM_ACTIONS, ROAD_OFFSET, ActionType, decode_action
+from edge import Edge
+from game import Game
+from player import Player
+from policy import Policy
+from topology import NUM_TILES
+from vector_state import (
+    OBSERVATION_SIZE,
+    OBSERVATION_SLICES,
+    VERTEX_TILE_TABLE,
+    encode_game,
+)
+from vertex import Vertex
+
+BatchPolicy = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+# Dots on each number token indexed by number + 1, the desert's -1 has none
+_PIPS_BY_NUMBER = np.array([0, 0, 0, 1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1], dtype=np.int16)
+
+
+class ArrayHeuristic:
+    """
+    HeuristicPolicy over a batch: settle on the highest summed pips, lowest
+    vertex id on ties, then build a random road off the settlement
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, observations: np.ndarray, masks: np.ndarray) -> np.ndarray:
+        numbers = observations[:, OBSERVATION_SLICES["tile_number"]]
+        tile_pips = np.zeros((len(observations), NUM_TILES + 1), dtype=np.int16)
+        tile_pips[:, :NUM_TILES] = _PIPS_BY_NUMBER[numbers + 1]
+
+        # Every row only has settlements or only roads legal, so one masked argmax
+        # over settle scores followed by random road scores covers both phases
+        scores = np.empty(masks.shape)
+        scores[:, :ROAD_OFFSET] = tile_pips[:, VERTEX_TILE_TABLE].sum(axis=2)
+        scores[:, ROAD_OFFSET:] = self.rng.random(
+            (len(masks), NUM_ACTIONS - ROAD_OFFSET)
+        )
+        scores[~masks] = -np.inf
+        return scores.argmax(axis=1)
+
+
+BATCH_POLICIES: Dict[str, Callable[[], BatchPolicy]] = {
+    "heuristic": ArrayHeuristic,
+}
+
+
+def load_batch_policy(name: str) -> BatchPolicy:
+    """
+    A registered name or "module:attribute", where the attribute builds the batch
+    policy when called, like load_policy
+    """
+    if name in BATCH_POLICIES:
+        return BATCH_POLICIES[name]()
+
+    module_name, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(
+            f"Unknown batch policy {name!r}, use one of {sorted(BATCH_POLICIES)} "
+            "or module:attribute"
+        )
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+class InferenceBroker:
+    def __init__(
+        self, policy: BatchPolicy, max_batch: int = 64, max_wait: float = 0.002
+    ):
+        self.policy = policy
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests: "queue.Queue[Optional[Tuple[Game, float, Future]]]" = (
+            queue.Queue()
+        )
+        # Reused for every batch, so encoding never allocates
+        self.observations = np.zeros((max_batch, OBSERVATION_SIZE), dtype=np.int8)
+        self.masks = np.zeros((max_batch, NUM_ACTIONS), dtype=bool)
+
+        self.batches = 0
+        self.decisions = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.policy_seconds = 0.0
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def decide(self, game: Game) -> int:
+        # Block until the broker has an action for the player to move in game
+        future: Future = Future()
+        self.requests.put((game, time.perf_counter(), future))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[Game, float, Future]]:
+        first = self.requests.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = first[1] + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = (
+                    self.requests.get(timeout=timeout)
+                    if timeout > 0
+                    else self.requests.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                # Finish this batch, then stop
+                self.requests.put(None)
+                break
+            batch.append(request)
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+
+            size = len(batch)
+            observations = self.observations[:size]
+            masks = self.masks[:size]
+            # Any error fails the whole batch, games waiting on it must never hang
+            try:
+                masks[:] = False
+                for row, (game, _, _) in enumerate(batch):
+                    encode_game(game, observations[row])
+                    masks[row, game.get_legal_actions()] = True
+
+                start = time.perf_counter()
+                actions = np.asarray(self.policy(observations, masks))
+                if actions.shape != (size,) or actions.dtype.kind not in "iu":
+                    raise ValueError(
+                        f"Batch policy returned {actions.dtype} actions of shape "
+                        f"{actions.shape}, expected one integer per row of {size}"
+                    )
+                if actions.min() < 0 or actions.max() >= NUM_ACTIONS:
+                    raise ValueError(
+                        f"Batch policy chose actions outside of 0-{NUM_ACTIONS - 1}"
+                    )
+            except Exception as error:
+                for _, _, future in batch:
+                    future.set_exception(error)
+                continue
+            done = time.perf_counter()
+
+            self.batches += 1
+            self.decisions += size
+            self.policy_seconds += done - start
+            for row, (_, submitted, future) in enumerate(batch):
+                waited = done - submitted
+                self.queue_seconds += waited
+                self.max_queue_seconds = max(self.max_queue_seconds, waited)
+                action = int(actions[row])
+                if masks[row, action]:
+                    future.set_result(action)
+                else:
+                    future.set_exception(
+                        ValueError(f"Batch policy chose illegal action {action}")
+                    )
+
+    def stats(self) -> Dict[str, float]:
+        batches = self.batches or 1
+        decisions = self.decisions or 1
+        return {
+            "batches": self.batches,
+            "decisions": self.decisions,
+            "mean_batch_size": self.decisions / batches,
+            "mean_batch_fill": self.decisions / (batches * self.max_batch),
+            "mean_queue_latency_ms": self.queue_seconds / decisions * 1000,
+            "max_queue_latency_ms": self.max_queue_seconds * 1000,
+            "policy_ms_per_batch": self.policy_seconds / batches * 1000,
+        }
+
+    def close(self) -> None:
+        self.requests.put(None)
+        self.thread.join()
+
+    def __enter__(self) -> "InferenceBroker":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class BrokeredPolicy(Policy):
+    """
+    Seat policy that sends every decision through a shared broker
+    """
+
+    def __init__(self, broker: InferenceBroker):
+        self.broker = broker
+
+    def choose_settlement(self, game, player: Player) -> Vertex:
+        action_type, index = decode_action(self.broker.decide(game))
+        assert action_type == ActionType.SETTLE
+        return game.board.vertices[index]
+
+    def choose_road(self, game, player: Player, vertex: Vertex) -> Edge:
+        action_type, index = decode_action(self.broker.decide(game))
+        assert action_type == ActionType.ROAD
+        return game.board.edges[index]
+
+
+def run_games(
+    games: int, threads: int, broker: InferenceBroker, seed: int = 0
+) -> List[Game]:
+    """
+    Play games headless settlement phases, threads of them at a time, with every
+    seat deciding through the broker
+    """
+    policies = [BrokeredPolicy(broker) for _ in range(4)]
+
+    def play(index: int) -> Game:
+        game = Game(headless=True, policies=policies, seed=seed + index)
+        game.run_headless()
+        return game
+
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(play, range(games)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Self-play through a batched broker")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--policy",
+        default="heuristic",
+        help="Batch policy, heuristic or module:attribute",
+    )
+    args = parser.parse_args()
+
+    policy = load_batch_policy(args.policy)
+    start = time.perf_counter()
+    with InferenceBroker(policy, args.max_batch, args.max_wait_ms / 1000) as broker:
+        run_games(args.games, args.threads, broker, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.games} games in {elapsed:.2f}s, {args.games / elapsed:.1f} games/sec")
+    for name, value in broker.stats().items():
+        print(f"{name:>22}: {value:.3f}")
+
+
+if __name__ == "__main__":
+    main()
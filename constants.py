@@ -107,6 +107,20 @@ class GamePhase(Enum):
     NON_SETTLEMENT = 2
 
 
+class TurnState(Enum):
+    # What the game is waiting for next
+    HUMAN_SETTLEMENT = 0
+    HUMAN_ROAD = 1
+    COMPUTER = 2
+    SETUP_OVER = 3
+
+
+class Building(Enum):
+    NONE = 0
+    SETTLEMENT = 1
+    CITY = 2
+
+
 RESOURCE_DICT = {
     Resource.DESERT.value: 1,
     Resource.SHEEP.value: 4,
@@ -116,6 +130,17 @@ RESOURCE_DICT = {
     Resource.BRICK.value: 3,
 }
 
+# Integer ids for array-backed state, the desert comes last since it has no cards
+RESOURCE_IDS = {
+    Resource.SHEEP.value: 0,
+    Resource.WHEAT.value: 1,
+    Resource.ORE.value: 2,
+    Resource.WOOD.value: 3,
+    Resource.BRICK.value: 4,
+    Resource.DESERT.value: 5,
+}
+NUM_RESOURCE_TYPES = 5
+
 NUMBER_DICT = {
     2: 1,
     3: 2,
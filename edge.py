@@ -2,37 +2,30 @@ from __future__ import annotations
 from typing import List, Tuple
 from constants import GamePhase
 from player import Player
+from profiling import profiled
 
 
 class Edge:
-    def __init__(self, vertex_set: Tuple["Vertex", "Vertex"]):  # type: ignore  # noqa: F821
+    __slots__ = ("id", "vertex_set", "road")
+
+    def __init__(self, id: int, vertex_set: Tuple["Vertex", "Vertex"]):  # type: ignore  # noqa: F821
+        self.id = id
         self.vertex_set: Tuple["Vertex"] = vertex_set  # type: ignore  # noqa: F821
         self.road = None
 
-    @classmethod
-    def generate_new_edge(
-        cls,
-        vertex_set: Tuple["Vertex", "Vertex"],  # type: ignore  # noqa: F821
-        list_of_edges: List["Edge"],
-    ) -> None:
-        repeat = False
-        for edge in list_of_edges:
-            if (
-                vertex_set[0].coordinate == edge.vertex_set[0].coordinate
-                and vertex_set[1].coordinate == edge.vertex_set[1].coordinate
-            ) or (
-                vertex_set[1].coordinate == edge.vertex_set[0].coordinate
-                and vertex_set[0].coordinate == edge.vertex_set[1].coordinate
-            ):
-                repeat = True
-                break
-
-        if not repeat:
-            list_of_edges.append(cls(vertex_set))
+    def __eq__(self, other):
+        if not isinstance(other, Edge):
+            return False
+        return self.id == other.id
+
+    def __hash__(self):
+        return self.id
 
+    @profiled("board.edge.build_road")
     def build_road(self, player) -> None:
         self.road = player
 
+    @profiled("board.edge.can_build_road")
     def check_if_can_build_road(
         self,
         edges: List[Edge],
@@ -41,17 +34,9 @@ class Edge:
         current_vertex: "Vertex",  # type: ignore  # noqa: F821
     ) -> None:
         if game_phase == GamePhase.SETTLEMENT_1.value:
-            if not self.road and (
-                self.vertex_set[0] == current_vertex
-                or self.vertex_set[1] == current_vertex
-            ):
+            if not self.road and current_vertex in self.vertex_set:
                 return True
 
-        # # Only for non-settlement phase (need player logic too)
-        # for edge in edges:
-        #     if (
-        #         edge.vertex_set[0] in self.vertex_set
-        #         or edge.vertex_set[1] in self.vertex_set
-        #     ) and edge.road:
-        #         return True
+        # Roads after setup have to connect to the player's network, which
+        # Bitboard.can_build_road checks from the board's bitboard
         return False
@@ -0,0 +1,128 @@
+"""
+Gym-style reinforcement learning environment around a headless Game.
+
+Every seat is played through step(), whoever's turn it is acts next. The observation
+uses the flat layout from vector_state and the legal action mask is handed back in
+info["action_mask"]. Both are kept up to date move by move instead of being rebuilt
+from a full board scan.
+"""
+
+import random
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from actions import (
+    END_TURN,
+    NUM_ACTIONS,
+    ROAD_OFFSET,
+    SETTLE_OFFSET,
+    ActionType,
+    decode_action,
+)
+from constants import RESOURCE_IDS, Building, GamePhase
+from features import PIP_SUM
+from game import Game
+from topology import NUM_VERTICES, VERTEX_EDGES, VERTEX_NEIGHBORS
+from vector_state import NO_OWNER, OBSERVATION_SIZE, OBSERVATION_SLICES
+
+
+class CatanEnv:
+    def __init__(self, seed: Optional[int] = None):
+        # Hands out one seed per game, so every episode can be replayed from its record
+        self.rng = random.Random(seed)
+        self.game: Optional[Game] = None
+        self.observation = np.zeros(OBSERVATION_SIZE, dtype=np.int8)
+        self.action_mask = np.zeros(NUM_ACTIONS, dtype=bool)
+        self.settleable = np.zeros(NUM_VERTICES, dtype=bool)
+
+        # Views into the observation so single entries can be written in place
+        self._vertex_owner = self.observation[OBSERVATION_SLICES["vertex_owner"]]
+        self._vertex_building = self.observation[OBSERVATION_SLICES["vertex_building"]]
+        self._edge_owner = self.observation[OBSERVATION_SLICES["edge_owner"]]
+        self._settle_mask = self.action_mask[SETTLE_OFFSET:ROAD_OFFSET]
+        self._road_mask = self.action_mask[ROAD_OFFSET:END_TURN]
+
+    def reset(self, seed: Optional[int] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        if seed is not None:
+            self.rng = random.Random(seed)
+        self.game = Game(headless=True, seed=self.rng.getrandbits(64))
+        board = self.game.board
+
+        self.observation[OBSERVATION_SLICES["tile_resource"]] = [
+            RESOURCE_IDS[tile.resource] for tile in board.tiles
+        ]
+        self.observation[OBSERVATION_SLICES["tile_number"]] = [
+            tile.number for tile in board.tiles
+        ]
+        self._vertex_owner[:] = NO_OWNER
+        self._vertex_building[:] = Building.NONE.value
+        self._edge_owner[:] = NO_OWNER
+
+        # The only full scan, after this the mask is patched per move
+        self.settleable[:] = False
+        for vertex in board.get_list_of_settleable_vertices():
+            self.settleable[vertex.id] = True
+        # Ending a turn stays masked until there is a phase after the settlement one
+        self.action_mask[:] = False
+        self._settle_mask[:] = self.settleable
+        self._update_turn()
+
+        return self.observation.copy(), self._info()
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
+        """
+        Returns observation, reward, terminated, truncated and info. The reward for
+        settling is the chance per roll that the new settlement produces, every other
+        action is worth nothing.
+        """
+        if self.game is None:
+            raise RuntimeError("Call reset() before step()")
+        if not self.action_mask[action]:
+            raise ValueError(f"Action {action} is not legal right now")
+
+        game = self.game
+        player_index = game.current_player_index
+        action_type, index = decode_action(action)
+        reward = 0.0
+
+        if action_type == ActionType.SETTLE:
+            vertex = game.board.vertices[index]
+            game.place_settlement(vertex)
+            self._vertex_owner[index] = player_index
+            self._vertex_building[index] = Building.SETTLEMENT.value
+            reward = float(game.board.vertex_features[index, PIP_SUM]) / 36
+
+            # Only the vertex and its neighbors can stop being settleable
+            self.settleable[index] = False
+            for neighbor in VERTEX_NEIGHBORS[index]:
+                self.settleable[neighbor] = False
+            self._settle_mask[:] = False
+            for edge_id in VERTEX_EDGES[index]:
+                self._road_mask[edge_id] = self._edge_owner[edge_id] == NO_OWNER
+
+        elif action_type == ActionType.ROAD:
+            current_vertex = game.current_vertex
+            game.place_road(game.board.edges[index])
+            self._edge_owner[index] = player_index
+
+            for edge_id in VERTEX_EDGES[current_vertex.id]:
+                self._road_mask[edge_id] = False
+            if game.game_phase == GamePhase.SETTLEMENT_0.value:
+                self._settle_mask[:] = self.settleable
+
+        self._update_turn()
+        terminated = game.game_phase == GamePhase.NON_SETTLEMENT.value
+
+        return self.observation.copy(), reward, terminated, False, self._info()
+
+    def _update_turn(self) -> None:
+        game = self.game
+        self.observation[OBSERVATION_SLICES["current_player"]] = (
+            game.current_player_index
+        )
+        self.observation[OBSERVATION_SLICES["game_phase"]] = game.game_phase
+
+    def _info(self) -> Dict[str, Any]:
+        return {
+            "action_mask": self.action_mask.copy(),
+            "current_player": self.game.current_player_index,
+        }
@@ -0,0 +1,97 @@
+"""
+Per-layout vertex feature tables.
+
+Everything a settlement heuristic wants to know about a vertex only depends on the
+layout, so it is computed once per board into a NumPy table with one row per vertex
+id. Picking a spot is then a masked argmax over a column instead of a Python loop
+over tile_association.
+
+Columns:
+    PIP_SUM         dots on the number tokens around the vertex (36 * chance per roll)
+    RESOURCE_PIPS   the same dots split by resource, in RESOURCE_IDS order
+    PORT            PORT_IDS of the vertex's port, 0 for none
+    DIVERSITY       how many different resources the vertex produces
+"""
+
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+from constants import NUM_RESOURCE_TYPES, RESOURCE_IDS, Port, Resource
+from layout import BoardLayout
+from topology import NUM_VERTICES, VERTEX_PORTS, VERTEX_TILES
+
+PIP_SUM = 0
+RESOURCE_PIPS = slice(1, 1 + NUM_RESOURCE_TYPES)
+PORT = 1 + NUM_RESOURCE_TYPES
+DIVERSITY = PORT + 1
+NUM_FEATURES = DIVERSITY + 1
+
+PORT_IDS = {
+    Port.NO_PORT.value: 0,
+    Port.THREE_FOR_ONE_PORT.value: 1,
+    Port.SHEEP_PORT.value: 2,
+    Port.WHEAT_PORT.value: 3,
+    Port.ORE_PORT.value: 4,
+    Port.WOOD_PORT.value: 5,
+    Port.BRICK_PORT.value: 6,
+}
+
+_VERTEX_PORT_IDS = np.array([PORT_IDS[port] for port in VERTEX_PORTS], dtype=np.int8)
+_VERTEX_BITS = np.arange(NUM_VERTICES, dtype=np.int64)
+
+
+def number_to_pips(number: int) -> int:
+    # 2 and 12 have one dot, 6 and 8 have five, the desert's -1 has none
+    return 0 if number == -1 else 6 - abs(7 - number)
+
+
+@lru_cache(maxsize=256)
+def vertex_features(layout: BoardLayout) -> np.ndarray:
+    """
+    The (NUM_VERTICES, NUM_FEATURES) table for a layout. Layouts are hashable, so
+    boards and searches on the same layout share one read-only table.
+    """
+    table = np.zeros((NUM_VERTICES, NUM_FEATURES), dtype=np.int8)
+    for vertex_id, tiles in enumerate(VERTEX_TILES):
+        for tile_id in tiles:
+            resource = layout.resources[tile_id]
+            if resource == Resource.DESERT.value:
+                continue
+            table[
+                vertex_id, RESOURCE_PIPS.start + RESOURCE_IDS[resource]
+            ] += number_to_pips(layout.numbers[tile_id])
+    table[:, PIP_SUM] = table[:, RESOURCE_PIPS].sum(axis=1)
+    table[:, PORT] = _VERTEX_PORT_IDS
+    table[:, DIVERSITY] = np.count_nonzero(table[:, RESOURCE_PIPS], axis=1)
+
+    table.setflags(write=False)
+    return table
+
+
+def vertex_scores(
+    features: np.ndarray, diversity_weight: float = 0.0, port_weight: float = 0.0
+) -> np.ndarray:
+    """
+    Pip sum, plus optional bonuses per different resource and for having a port
+    """
+    scores = features[:, PIP_SUM].astype(np.float64)
+    if diversity_weight:
+        scores += diversity_weight * features[:, DIVERSITY]
+    if port_weight:
+        scores += port_weight * (features[:, PORT] != 0)
+    return scores
+
+
+def mask_to_array(mask: int) -> np.ndarray:
+    # A board.settleable_mask as a boolean array indexed by vertex id
+    return (np.int64(mask) >> _VERTEX_BITS & 1).astype(bool)
+
+
+def best_vertex(scores: np.ndarray, mask: int) -> Optional[int]:
+    """
+    Id of the highest scoring vertex whose bit is set in mask, the lowest id wins
+    ties. None when no bit is set.
+    """
+    if not mask:
+        return None
+    return int(np.argmax(np.where(mask_to_array(mask), scores, -np.inf)))
@@ -1,17 +1,81 @@
+"""
+The rules engine. pygame and the renderer are only imported once a game with a
+window is created, so headless games and worker processes never load them.
+"""
+
 import random
-from typing import List
-import pygame
+from typing import List, NamedTuple, Optional, Tuple
+from actions import ActionType, decode_action, road_action, settle_action
+from bitboard import bit_ids
 from board import Board
-from constants import Color, GamePhase
+from constants import GamePhase, TurnState
+from edge import Edge
+from game_record import GameRecord, check_seed
+from layout import BoardLayout
 from player import Player
+from policy import HeuristicPolicy, Policy
+from profiling import profiled
 from vertex import Vertex
+from zobrist import CURRENT_VERTEX_KEYS, PHASE_KEYS, PLAYER_TO_MOVE_KEYS
+
+
+class MoveRecord(NamedTuple):
+    # Everything a move overwrites that can't be cheaply derived when undoing it
+    action: int
+    game_phase: int
+    current_player_index: int
+    number_of_turns: int
+    current_vertex: Optional[Vertex]
+    settleable_mask: int
+    longest_road_holder: Optional[int]
 
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((1100, 800))
-        self.board = Board(self.screen)
-        randomized_list = self.randomize_player_cpu_order()
+    def __init__(
+        self,
+        headless: bool = False,
+        layout: Optional[BoardLayout] = None,
+        policies: Optional[List[Policy]] = None,
+        seed: Optional[int] = None,
+        fast_forward: bool = False,
+        computer_delay: int = 2000,
+    ):
+        """
+        A headless game has no window and only computer players, call run_headless()
+        to play it out. Policies decide the computer moves, one per seat.
+
+        With a window, each computer turn starts computer_delay milliseconds after
+        the previous move, or immediately when fast_forward is set.
+
+        All randomness in the game (layout, seating, computer choices) comes from
+        self.rng, so the seed and the list of actions taken reproduce a game exactly.
+        """
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = check_seed(seed)
+        self.rng = random.Random(seed)
+        self.layout_from_seed = layout is None
+        # Every move as an action id, see actions.py
+        self.actions: List[int] = []
+        self.undo_stack: List[MoveRecord] = []
+        self.redo_stack: List[int] = []
+
+        self.headless = headless
+        self.fast_forward = fast_forward
+        self.computer_delay = computer_delay
+        self.policies = policies or [HeuristicPolicy() for _ in range(4)]
+        self.renderer = None
+        if not headless:
+            import pygame
+            from renderer import Renderer
+
+            self.screen = pygame.display.set_mode((1100, 800))
+            self.renderer = Renderer(self.screen)
+        self.board = Board(self.renderer, layout, self.rng)
+        if headless:
+            randomized_list = [False, False, False, False]
+        else:
+            randomized_list = self.randomize_player_cpu_order(self.rng)
         self.players = [
             Player(1, "Player 1", randomized_list[0]),
             Player(2, "Player 2", randomized_list[1]),
@@ -20,140 +84,303 @@ class Game:
         ]
         self.game_phase = GamePhase.SETTLEMENT_0.value
 
-        self.start_game()
+        # Current Player
+        self.current_player_index = 0
+        self.number_of_turns = 0
+        self.current_vertex = None
+
+        if not headless:
+            self.start_game()
 
     @staticmethod
-    def randomize_player_cpu_order() -> List[bool]:
+    def randomize_player_cpu_order(rng: random.Random) -> List[bool]:
         # Get order of player and cpu
         player_order = [False, False, False, True]
-        random.shuffle(player_order)
+        rng.shuffle(player_order)
 
         return player_order
 
-    def start_game(self):
-        clock = pygame.time.Clock()
-        running = True
+    @property
+    def turn_state(self) -> TurnState:
+        if self.game_phase == GamePhase.NON_SETTLEMENT.value:
+            return TurnState.SETUP_OVER
+        if not self.players[self.current_player_index].is_human:
+            return TurnState.COMPUTER
+        if self.game_phase == GamePhase.SETTLEMENT_0.value:
+            return TurnState.HUMAN_SETTLEMENT
+        return TurnState.HUMAN_ROAD
+
+    def start_game(self) -> None:
+        """
+        Run the window until it is closed. The loop sleeps in pygame.event.wait(),
+        so it only wakes up for input and for the one shot timer that starts the
+        next computer turn. In fast forward mode there is no timer, computer turns
+        are played back to back as soon as they come up.
+        """
+        import pygame
 
         # TODO:
         # Make UI better for which player is up and which vertices can be settled on
         # Make each player have a list of already settlements
         # Player / CPU roles and actions (create better heuristic)
 
-        # Current Player
-        current_player_index = 0
-        number_of_turns = 0
-        current_vertex = None
-
-        WAIT_EVENT = pygame.USEREVENT + 1
-        pygame.time.set_timer(WAIT_EVENT, 2000)
+        computer_turn_event = pygame.USEREVENT + 1
 
-        self.show_whose_turn(self.players[current_player_index])
+        self.show_whose_turn(self.players[self.current_player_index])
+        self._queue_computer_turns(computer_turn_event)
         # Run game
-        while running:
-            clock.tick(60)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                if self.game_phase in [
-                    GamePhase.SETTLEMENT_0.value,
-                    GamePhase.SETTLEMENT_1.value,
-                ]:
-                    if self.players[current_player_index].is_human:
-                        if event.type == pygame.MOUSEBUTTONDOWN:
-                            mouse_pos = pygame.mouse.get_pos()
-                            vertex = self.board.check_if_vertex_collision(mouse_pos)
-                            if (
-                                vertex
-                                and self.game_phase == GamePhase.SETTLEMENT_0.value
-                            ):
-                                current_vertex = vertex
-                                self.board.create_settlement(
-                                    vertex, self.players[current_player_index]
-                                )
-                                self.game_phase = GamePhase.SETTLEMENT_1.value
-                            # Redraw settleable vertices
-                            self.board.redraw_settleable_vertices()
-                            edge = self.board.check_if_edge_collision(
-                                mouse_pos,
-                                self.players[current_player_index],
-                                self.game_phase,
-                                current_vertex,
-                            )
-                            if edge and self.game_phase == GamePhase.SETTLEMENT_1.value:
-                                self.board.create_road(
-                                    edge, self.players[current_player_index]
-                                )
-                                self.game_phase = GamePhase.SETTLEMENT_0.value
-                                number_of_turns += 1
-                                if number_of_turns > 7:
-                                    self.game_phase = GamePhase.NON_SETTLEMENT.value
-                                elif number_of_turns > 3:
-                                    current_player_index = 7 - number_of_turns
-                                else:
-                                    current_player_index = number_of_turns
-                                self.show_whose_turn(self.players[current_player_index])
-                    else:
-                        if event.type == WAIT_EVENT:
-                            self.computer_settlement_phase(
-                                self.players[current_player_index]
-                            )
-                            self.board.redraw_settleable_vertices()
-                            number_of_turns += 1
-                            if number_of_turns > 7:
-                                self.game_phase = GamePhase.NON_SETTLEMENT.value
-                            elif number_of_turns > 3:
-                                current_player_index = 7 - number_of_turns
-                            else:
-                                current_player_index = number_of_turns
-                            self.show_whose_turn(self.players[current_player_index])
-
-    def computer_heuristic(self, possible_vertices: List[Vertex]) -> Vertex:
-        best_vertex_score = 0
-        best_vertex = None
-        for vertex in possible_vertices:
-            current_score = 0
-            for tile in vertex.tile_association:
-                current_score += tile.tile_num_to_prob()
-
-            if current_score > best_vertex_score:
-                best_vertex_score = current_score
-                best_vertex = vertex
-
-        return best_vertex
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                break
+
+            state = self.turn_state
+            if event.type == pygame.MOUSEBUTTONDOWN and state in (
+                TurnState.HUMAN_SETTLEMENT,
+                TurnState.HUMAN_ROAD,
+            ):
+                if self.handle_click(event.pos):
+                    self._queue_computer_turns(computer_turn_event)
+            elif event.type == computer_turn_event and state == TurnState.COMPUTER:
+                self._play_computer_turn()
+                self._queue_computer_turns(computer_turn_event)
+
+    def handle_click(self, click_position: Tuple[int, int]) -> bool:
+        """
+        Play the human's settlement or road at the click, returns whether the click
+        made a move
+        """
+        state = self.turn_state
+        if state == TurnState.HUMAN_SETTLEMENT:
+            vertex = self.board.check_if_vertex_collision(click_position)
+            if not vertex:
+                return False
+            self.place_settlement(vertex)
+            # Redraw settleable vertices
+            self.board.redraw_settleable_vertices()
+            return True
+
+        if state == TurnState.HUMAN_ROAD:
+            edge = self.board.check_if_edge_collision(
+                click_position,
+                self.players[self.current_player_index],
+                self.game_phase,
+                self.current_vertex,
+            )
+            if not edge:
+                return False
+            self.place_road(edge)
+            self.show_whose_turn(self.players[self.current_player_index])
+            return True
+
+        return False
+
+    def _play_computer_turn(self) -> None:
+        self.computer_settlement_phase(self.players[self.current_player_index])
+        self.board.redraw_settleable_vertices()
+        self.show_whose_turn(self.players[self.current_player_index])
+
+    def _queue_computer_turns(self, computer_turn_event: int) -> None:
+        # Start the next computer turn, if it is one: right away when fast forwarding,
+        # otherwise after the delay
+        if self.turn_state != TurnState.COMPUTER:
+            return
+        if not self.fast_forward:
+            import pygame
+
+            pygame.time.set_timer(computer_turn_event, self.computer_delay, loops=1)
+            return
+
+        # Draw the whole run of turns at once, not move by move
+        self.renderer.defer_updates = True
+        while self.turn_state == TurnState.COMPUTER:
+            self._play_computer_turn()
+        self.renderer.defer_updates = False
+        self.renderer.present()
+
+    @profiled("game.place_settlement")
+    def place_settlement(self, vertex: Vertex) -> None:
+        # Settle for the current player, their road has to come off this vertex
+        self._remember_move(settle_action(vertex.id))
+        self.current_vertex = vertex
+        self.board.create_settlement(vertex, self.players[self.current_player_index])
+        self.game_phase = GamePhase.SETTLEMENT_1.value
+
+    @profiled("game.place_road")
+    def place_road(self, edge: Edge) -> None:
+        # The road finishes the current player's settlement turn
+        self._remember_move(road_action(edge.id))
+        self.board.create_road(edge, self.players[self.current_player_index])
+        self.game_phase = GamePhase.SETTLEMENT_0.value
+        self.next_turn()
 
+    @profiled("game.legal_actions")
+    def get_legal_actions(self) -> List[int]:
+        # Straight off the bitboards, no Vertex or Edge objects involved
+        if self.game_phase == GamePhase.SETTLEMENT_0.value:
+            return [settle_action(i) for i in bit_ids(self.board.settleable_mask)]
+        if self.game_phase == GamePhase.SETTLEMENT_1.value:
+            moves = self.board.bitboard.setup_road_moves(self.current_vertex.id)
+            return [road_action(i) for i in bit_ids(moves)]
+        return []
+
+    def is_legal(self, action: int) -> bool:
+        # get_legal_actions() for a single action, one bit test instead of a list
+        action_type, index = decode_action(action)
+        if self.game_phase == GamePhase.SETTLEMENT_0.value:
+            return action_type == ActionType.SETTLE and bool(
+                self.board.settleable_mask >> index & 1
+            )
+        if self.game_phase == GamePhase.SETTLEMENT_1.value:
+            moves = self.board.bitboard.setup_road_moves(self.current_vertex.id)
+            return action_type == ActionType.ROAD and bool(moves >> index & 1)
+        return False
+
+    def apply_action(self, action: int) -> None:
+        if not self.is_legal(action):
+            raise ValueError(f"Action {action} isn't legal in this position")
+        action_type, index = decode_action(action)
+        if action_type == ActionType.SETTLE:
+            self.place_settlement(self.board.vertices[index])
+        else:
+            self.place_road(self.board.edges[index])
+
+    def do_move(self, action: int) -> None:
+        """
+        Apply a new move, this drops anything that could have been redone. Every move
+        can be taken back with undo_move(), both are O(1) apart from the longest road
+        component the move touches.
+        """
+        self.redo_stack.clear()
+        self.apply_action(action)
+
+    def _remember_move(self, action: int) -> None:
+        self.actions.append(action)
+        self.undo_stack.append(
+            MoveRecord(
+                action,
+                self.game_phase,
+                self.current_player_index,
+                self.number_of_turns,
+                self.current_vertex,
+                self.board.settleable_mask,
+                self.board.longest_road.holder,
+            )
+        )
+
+    @profiled("game.undo_move")
+    def undo_move(self) -> None:
+        move = self.undo_stack.pop()
+        action_type, index = decode_action(move.action)
+        if action_type == ActionType.SETTLE:
+            self.board.undo_settlement(self.board.vertices[index], move.settleable_mask)
+        else:
+            self.board.undo_road(self.board.edges[index])
+        # Who holds longest road depends on history, so it is restored rather than
+        # recomputed
+        self.board.longest_road.holder = move.longest_road_holder
+
+        self.game_phase = move.game_phase
+        self.current_player_index = move.current_player_index
+        self.number_of_turns = move.number_of_turns
+        self.current_vertex = move.current_vertex
+        self.actions.pop()
+        self.redo_stack.append(move.action)
+
+    def redo_move(self) -> None:
+        self.apply_action(self.redo_stack.pop())
+
+    def snapshot(self) -> Tuple[int, ...]:
+        """
+        Flat, hashable copy of the position. The seed and the moves from it pin the
+        game down exactly, so the moves are all that needs saving.
+        """
+        return tuple(self.actions)
+
+    def restore(self, snapshot: Tuple[int, ...]) -> None:
+        # Undo back to where the two lines split, then play the snapshot forward
+        common = 0
+        for current, saved in zip(self.actions, snapshot):
+            if current != saved:
+                break
+            common += 1
+        while len(self.actions) > common:
+            self.undo_move()
+        for action in snapshot[common:]:
+            self.do_move(action)
+
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        Hash of the whole position: the board's incrementally kept hash plus whose
+        turn it is, the phase and, while a setup road is pending, which settlement
+        it has to come off
+        """
+        h = (
+            self.board.zobrist_hash
+            ^ PLAYER_TO_MOVE_KEYS[self.current_player_index]
+            ^ PHASE_KEYS[self.game_phase]
+        )
+        if self.game_phase == GamePhase.SETTLEMENT_1.value:
+            h ^= CURRENT_VERTEX_KEYS[self.current_vertex.id]
+        return h
+
+    def record(self) -> GameRecord:
+        if not self.layout_from_seed:
+            raise ValueError(
+                "Only games whose layout came from their seed can be recorded"
+            )
+        return GameRecord(self.seed, self.actions)
+
+    @classmethod
+    def replay(cls, record: GameRecord) -> "Game":
+        """
+        Rebuild a recorded game headless, no policies run so it goes at engine speed.
+        A record with a move that isn't legal, say a corrupt one, raises ValueError.
+        """
+        game = cls(headless=True, seed=record.seed)
+        for move, action in enumerate(record.actions):
+            try:
+                game.do_move(action)
+            except ValueError as error:
+                raise ValueError(f"Move {move} of the record: {error}") from error
+
+        return game
+
+    @profiled("game.roll_dice")
+    def roll_dice(self) -> int:
+        # The robber isn't in the game yet, so a 7 simply pays nothing
+        roll = self.rng.randint(1, 6) + self.rng.randint(1, 6)
+        self.board.distribute_resources(roll)
+        return roll
+
+    def next_turn(self) -> None:
+        # Snake draft: players 0-3 settle, then 3-0
+        self.number_of_turns += 1
+        if self.number_of_turns > 7:
+            self.game_phase = GamePhase.NON_SETTLEMENT.value
+        elif self.number_of_turns > 3:
+            self.current_player_index = 7 - self.number_of_turns
+        else:
+            self.current_player_index = self.number_of_turns
+
+    def run_headless(self) -> None:
+        # Play every computer turn back to back until the settlement phase is over
+        while self.game_phase != GamePhase.NON_SETTLEMENT.value:
+            self.computer_settlement_phase(self.players[self.current_player_index])
+
+    @profiled("game.computer_turn")
     def computer_settlement_phase(self, player: Player) -> None:
+        policy = self.policies[player.id - 1]
+
         # Computer settle
-        possible_vertices = self.board.get_list_of_settleable_vertices()
-        vertex_to_settle = self.computer_heuristic(possible_vertices)
-        self.board.create_settlement(vertex_to_settle, player)
+        vertex_to_settle = policy.choose_settlement(self, player)
+        self.place_settlement(vertex_to_settle)
 
         # Computer build road
-        possible_edges = self.board.get_list_of_edges_off_vertex(vertex_to_settle)
-        edge_to_settle = random.choice(possible_edges)
-        self.board.create_road(edge_to_settle, player)
+        edge_to_settle = policy.choose_road(self, player, vertex_to_settle)
+        self.place_road(edge_to_settle)
 
     def show_whose_turn(self, player: Player):
-        # Show who is currently settling in the bottom left
-        font = pygame.font.Font(None, 36)
-        computer_str = "(Computer)"
-        # there is definitely a better way to do this (write over the previous name)
-        if player.is_human:
-            computer_str = "                       "
-
-        text = "It is " + player.name + "'s turn! " + computer_str
-
-        text_surface = font.render(text, True, player.color)  # White text
-        text_rect = text_surface.get_rect()
-
-        padding = 10
-        text_rect.topleft = (
-            padding,
-            self.screen.get_height() - text_rect.height - padding,
-        )
-        # Write whose turn it is on the screen
-        pygame.draw.rect(self.screen, Color.BACKGROUND.to_rgb(), text_rect)
-        self.screen.blit(text_surface, text_rect)
-
-        pygame.display.flip()
-
-    pygame.quit()
+        if self.renderer:
+            self.renderer.show_whose_turn(player)
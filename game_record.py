@@ -0,0 +1,79 @@
+"""
+Compact game records for replay and training data.
+
+A game is fully determined by its seed and the actions taken, so that is all a
+record stores. Packed, a record is a 15 byte header followed by one byte per action:
+
+    magic  b"CTN"   3 bytes
+    version         1 byte
+    seed            8 bytes, unsigned little endian
+    action count    3 bytes, unsigned little endian
+    actions         1 byte each (every action id is below 256)
+"""
+
+import struct
+from typing import List, Sequence
+
+MAGIC = b"CTN"
+VERSION = 1
+_HEADER = struct.Struct("<3sBQ3s")
+MAX_SEED = (1 << 64) - 1
+
+
+def check_seed(seed: int) -> int:
+    # Seeds have to fit the record header, an unsigned 64 bit int
+    if not isinstance(seed, int) or isinstance(seed, bool) or not 0 <= seed <= MAX_SEED:
+        raise ValueError(f"Seed {seed!r} is not an integer from 0 to 2**64 - 1")
+    return seed
+
+
+class GameRecord:
+    def __init__(self, seed: int, actions: Sequence[int]):
+        self.seed = seed
+        self.actions: List[int] = list(actions)
+
+    def __eq__(self, other):
+        if not isinstance(other, GameRecord):
+            return False
+        return self.seed == other.seed and self.actions == other.actions
+
+    def __repr__(self) -> str:
+        return f"GameRecord(seed={self.seed}, actions={self.actions})"
+
+    def pack(self) -> bytes:
+        return _HEADER.pack(
+            MAGIC, VERSION, self.seed, len(self.actions).to_bytes(3, "little")
+        ) + bytes(self.actions)
+
+    @classmethod
+    def unpack(cls, data: bytes, offset: int = 0) -> "GameRecord":
+        # The record starting at offset, read in place so the rest isn't copied
+        magic, version, seed, count = _HEADER.unpack_from(data, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version 1 game record")
+        count = int.from_bytes(count, "little")
+        start = offset + _HEADER.size
+        actions = data[start : start + count]
+        if len(actions) != count:
+            raise ValueError("Game record is truncated")
+        return cls(seed, actions)
+
+    @property
+    def packed_size(self) -> int:
+        return _HEADER.size + len(self.actions)
+
+
+def pack_records(records: Sequence[GameRecord]) -> bytes:
+    # Records carry their own length, so they can simply be concatenated
+    return b"".join(record.pack() for record in records)
+
+
+def unpack_records(data: bytes) -> List[GameRecord]:
+    records: List[GameRecord] = []
+    offset = 0
+    while offset < len(data):
+        record = GameRecord.unpack(data, offset)
+        records.append(record)
+        offset += record.packed_size
+
+    return records
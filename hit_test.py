@@ -0,0 +1,93 @@
+"""
+Constant time mouse hit-testing.
+
+Vertices and edge midpoints are bucketed into a uniform pixel grid, each point is
+added to every cell its click radius overlaps, so a click only has to look at the
+handful of points in its own cell. Tiles don't need a grid at all, the pixel is
+converted back to hex coordinates and rounded to the nearest hex.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+from constants import HEX_SIZE, OFFSET_Q, OFFSET_R
+from topology import EDGE_VERTICES, TILE_COORDINATES, VERTEX_COORDINATES
+
+CLICK_THRESHOLD = 10
+
+
+class HitTestIndex:
+    def __init__(
+        self,
+        points: Sequence[Tuple[float, float]],
+        threshold: float = CLICK_THRESHOLD,
+        cell_size: float = 2 * CLICK_THRESHOLD,
+    ):
+        self.points = points
+        self.threshold_squared = threshold**2
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        for i, (x, y) in enumerate(points):
+            for cell_x in range(
+                self._cell(x - threshold), self._cell(x + threshold) + 1
+            ):
+                for cell_y in range(
+                    self._cell(y - threshold), self._cell(y + threshold) + 1
+                ):
+                    self.cells.setdefault((cell_x, cell_y), []).append(i)
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def query(self, position: Tuple[float, float]) -> List[int]:
+        """
+        Ids of every point within the threshold of position
+        """
+        mx, my = position
+        return [
+            i
+            for i in self.cells.get((self._cell(mx), self._cell(my)), ())
+            if (mx - self.points[i][0]) ** 2 + (my - self.points[i][1]) ** 2
+            <= self.threshold_squared
+        ]
+
+
+_TILE_IDS: Dict[Tuple[int, int], int] = {
+    (q + OFFSET_Q, r + OFFSET_R): i for i, (q, r) in enumerate(TILE_COORDINATES)
+}
+
+
+def tile_at(position: Tuple[float, float]) -> Optional[int]:
+    """
+    Id of the tile under position, the inverse of topology.hex_to_pixel
+    """
+    x, y = position
+    q = y / (HEX_SIZE * 3 / 2)
+    r = x / (HEX_SIZE * math.sqrt(3)) - q / 2
+
+    # Cube rounding, fix whichever coordinate rounded the furthest
+    s = -q - r
+    rounded_q, rounded_r, rounded_s = round(q), round(r), round(s)
+    q_diff, r_diff, s_diff = (
+        abs(rounded_q - q),
+        abs(rounded_r - r),
+        abs(rounded_s - s),
+    )
+    if q_diff > r_diff and q_diff > s_diff:
+        rounded_q = -rounded_r - rounded_s
+    elif r_diff > s_diff:
+        rounded_r = -rounded_q - rounded_s
+
+    return _TILE_IDS.get((rounded_q, rounded_r))
+
+
+VERTEX_INDEX = HitTestIndex(VERTEX_COORDINATES)
+EDGE_INDEX = HitTestIndex(
+    [
+        (
+            (VERTEX_COORDINATES[a][0] + VERTEX_COORDINATES[b][0]) / 2,
+            (VERTEX_COORDINATES[a][1] + VERTEX_COORDINATES[b][1]) / 2,
+        )
+        for a, b in EDGE_VERTICES
+    ]
+)
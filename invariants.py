@@ -0,0 +1,255 @@
+"""
+Self-check for the incrementally maintained game state.
+
+Plays random positions and compares every incremental structure against a
+from-scratch computation of the same thing:
+
+    longest_road    LongestRoadTracker lengths against a full trail search, while
+                    roads and settlements are added and taken back out
+    undo            on a position with long roads built straight on the board,
+                    illegal moves are turned down, undo_move brings back the hash,
+                    settleable mask, bitboards, longest road lengths and holder and
+                    whose turn it is, and redo_move gets back to where it was
+    restore         restore() to a snapshot matches replaying that snapshot's moves
+                    on a fresh game
+
+Exits non-zero on the first mismatch. Run it after touching any of them.
+
+Example:
+    python invariants.py --games 300
+"""
+
+import argparse
+import random
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+from actions import NUM_ACTIONS
+from bitboard import ALL_EDGES, bit_ids
+from board import Board
+from game import Game
+from game_record import GameRecord
+from player import Player
+from topology import EDGE_VERTICES
+
+NUM_PLAYERS = 4
+
+
+def longest_road_by_search(board: Board, player: int) -> int:
+    """
+    Longest trail through the player's roads that never reuses a road and stops at,
+    but doesn't pass through, an opponent's building
+    """
+    roads = [
+        edge.id for edge in board.edges if edge.road and edge.road.id - 1 == player
+    ]
+    blocked = {
+        vertex.id
+        for vertex in board.vertices
+        if vertex.settlement and vertex.settlement.id - 1 != player
+    }
+
+    def walk(vertex: int, used: List[int]) -> int:
+        best = len(used)
+        if used and vertex in blocked:
+            return best
+        for road in roads:
+            a, b = EDGE_VERTICES[road]
+            if road not in used and vertex in (a, b):
+                used.append(road)
+                best = max(best, walk(b if vertex == a else a, used))
+                used.pop()
+        return best
+
+    starts = {vertex for road in roads for vertex in EDGE_VERTICES[road]}
+    return max((walk(vertex, []) for vertex in starts), default=0)
+
+
+def check_longest_road(seed: int) -> None:
+    rng = random.Random(seed)
+    board = Board(rng=rng)
+    players = [Player(i + 1, f"Player {i + 1}", False) for i in range(NUM_PLAYERS)]
+    # (edge or vertex, mask before) per build, so everything can be taken back
+    built = []
+
+    def check(step: str) -> None:
+        for player in range(NUM_PLAYERS):
+            expected = longest_road_by_search(board, player)
+            actual = board.longest_road.length(player)
+            if actual != expected:
+                raise AssertionError(
+                    f"seed {seed}, {step}: player {player} longest road is "
+                    f"{actual}, a full search finds {expected}"
+                )
+
+    # Roads are clustered on a few players so long trails actually form
+    for _ in range(rng.randint(10, 40)):
+        player = players[rng.randrange(2)]
+        free_edges = [edge for edge in board.edges if not edge.road]
+        settleable = board.get_list_of_settleable_vertices()
+        if settleable and rng.random() < 0.2:
+            vertex = rng.choice(settleable)
+            built.append((vertex, board.settleable_mask))
+            board.create_settlement(vertex, rng.choice(players))
+        else:
+            edge = rng.choice(free_edges)
+            built.append((edge, None))
+            board.create_road(edge, player)
+        check("after a build")
+
+    while built:
+        piece, settleable_mask = built.pop()
+        if settleable_mask is None:
+            board.undo_road(piece)
+        else:
+            board.undo_settlement(piece, settleable_mask)
+        check("after an undo")
+
+
+def _state(game: Game) -> Tuple[Any, ...]:
+    # Everything a move changes, incrementally kept or not
+    board = game.board
+    return (
+        game.zobrist_hash,
+        board.settleable_mask,
+        tuple(board.bitboard.buildings),
+        tuple(board.bitboard.roads),
+        tuple(board.longest_road.lengths),
+        board.longest_road.holder,
+        game.game_phase,
+        game.current_player_index,
+        game.number_of_turns,
+        game.current_vertex,
+        tuple(game.actions),
+        tuple(vertex.settlement for vertex in board.vertices),
+        tuple(edge.road for edge in board.edges),
+    )
+
+
+def _random_moves(game: Game, rng: random.Random, moves: int) -> List[int]:
+    # Play up to that many random legal moves, fewer if the game runs out of them
+    played = []
+    for _ in range(moves):
+        legal = game.get_legal_actions()
+        if not legal:
+            break
+        action = rng.choice(legal)
+        game.do_move(action)
+        played.append(action)
+    return played
+
+
+def _build_position(game: Game, rng: random.Random) -> None:
+    """
+    Build a position past what setup reaches straight on the board: long roads for
+    two players and a few settlements, so setup moves played on top of it cut roads
+    and move longest road around
+    """
+    board = game.board
+    bitboard = board.bitboard
+    for _ in range(rng.randint(10, 30)):
+        player = rng.randrange(2)
+        connected = bit_ids(bitboard.road_moves(player))
+        settleable = bit_ids(board.settleable_mask)
+        if settleable and len(settleable) > 30 and rng.random() < 0.1:
+            vertex = board.vertices[rng.choice(settleable)]
+            board.create_settlement(vertex, game.players[rng.randrange(NUM_PLAYERS)])
+        else:
+            edges = connected or bit_ids(ALL_EDGES & ~bitboard.built_roads)
+            board.create_road(board.edges[rng.choice(edges)], game.players[player])
+
+
+def check_undo(seed: int) -> None:
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed)
+    _build_position(game, rng)
+    states = [_state(game)]
+    for move in range(rng.randint(8, 16)):
+        legal = game.get_legal_actions()
+        if not legal:
+            break
+        # Illegal moves are turned down without touching the game
+        illegal = rng.choice([a for a in range(NUM_ACTIONS) if a not in legal])
+        try:
+            game.do_move(illegal)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"seed {seed}: illegal action {illegal} was played")
+        if _state(game) != states[-1]:
+            raise AssertionError(f"seed {seed}: rejecting {illegal} changed the state")
+
+        game.do_move(rng.choice(legal))
+        after = _state(game)
+        game.undo_move()
+        if _state(game) != states[-1]:
+            raise AssertionError(f"seed {seed}: undoing move {move} changed the state")
+        game.redo_move()
+        if _state(game) != after:
+            raise AssertionError(f"seed {seed}: redoing move {move} changed the state")
+        states.append(after)
+
+    # All the way back to the start
+    while game.undo_stack:
+        game.undo_move()
+        states.pop()
+        if _state(game) != states[-1]:
+            raise AssertionError(
+                f"seed {seed}: undo back to move {len(states) - 1} changed the state"
+            )
+
+
+def check_restore(seed: int) -> None:
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed)
+    snapshots = []
+    for _ in range(rng.randint(3, 8)):
+        # Branch off an earlier snapshot now and then, so lines diverge
+        if snapshots and rng.random() < 0.5:
+            game.restore(rng.choice(snapshots))
+        _random_moves(game, rng, rng.randint(1, 12))
+        snapshots.append(game.snapshot())
+
+    for snapshot in snapshots:
+        game.restore(snapshot)
+        fresh = Game(headless=True, seed=seed)
+        for action in snapshot:
+            fresh.do_move(action)
+        if _state(game) != _state(fresh):
+            raise AssertionError(
+                f"seed {seed}: restoring {len(snapshot)} moves differs from replaying"
+            )
+    replayed = Game.replay(GameRecord(seed, snapshots[-1]))
+    if replayed.zobrist_hash != game.zobrist_hash:
+        raise AssertionError(f"seed {seed}: replaying the record changed the hash")
+
+
+CHECKS: Dict[str, Callable[[int], None]] = {
+    "longest_road": check_longest_road,
+    "undo": check_undo,
+    "restore": check_restore,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check incremental game state")
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--only",
+        help="Comma separated checks, all of them by default: " + ", ".join(CHECKS),
+    )
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(CHECKS)
+    for name in names:
+        for game in range(args.games):
+            try:
+                CHECKS[name](args.seed + game)
+            except AssertionError as error:
+                print(f"{name}: FAILED, {error}")
+                sys.exit(1)
+        print(f"{name}: {args.games} games ok")
+
+
+if __name__ == "__main__":
+    main()
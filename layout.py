@@ -0,0 +1,114 @@
+"""
+Board layout generation.
+
+Instead of reshuffling until a layout happens to be legal, the 6/8 and 2/12 tokens
+are placed directly onto sets of tiles that are known not to touch. Those sets are
+enumerated once at import, so generating a layout is a fixed amount of work.
+"""
+
+import random
+from itertools import combinations
+from typing import List, NamedTuple, Optional, Tuple
+from constants import NUMBER_DICT, RESOURCE_DICT, Resource
+from topology import NUM_TILES, TILE_NEIGHBORS, VERTEX_TILES
+
+RED_NUMBERS = (6, 8)
+RARE_NUMBERS = (2, 12)
+
+
+class BoardLayout(NamedTuple):
+    # Indexed by tile id, the desert has number -1
+    resources: Tuple[str, ...]
+    numbers: Tuple[int, ...]
+
+
+def is_layout_legal(numbers: List[int]) -> bool:
+    """
+    No vertex may touch two of 6/8 or two of 2/12
+    """
+    for tiles in VERTEX_TILES:
+        counter_6_8 = 0
+        counter_2_12 = 0
+        for tile_id in tiles:
+            if numbers[tile_id] in RED_NUMBERS:
+                counter_6_8 += 1
+            if numbers[tile_id] in RARE_NUMBERS:
+                counter_2_12 += 1
+        if counter_6_8 > 1 or counter_2_12 > 1:
+            return False
+
+    return True
+
+
+def _non_touching_tile_sets(size: int) -> List[Tuple[int, ...]]:
+    return [
+        tiles
+        for tiles in combinations(range(NUM_TILES), size)
+        if all(b not in TILE_NEIGHBORS[a] for a, b in combinations(tiles, 2))
+    ]
+
+
+def _token_list(numbers) -> List[int]:
+    return [number for number in numbers for _ in range(NUMBER_DICT[number])]
+
+
+_RED_TOKENS = _token_list(RED_NUMBERS)
+_RARE_TOKENS = _token_list(RARE_NUMBERS)
+_OTHER_TOKENS = _token_list(
+    [n for n in NUMBER_DICT if n not in RED_NUMBERS and n not in RARE_NUMBERS]
+)
+_RESOURCES = [value for value, count in RESOURCE_DICT.items() for _ in range(count)]
+
+# Legal placements of the red tokens for every possible desert tile
+_RED_SETS = _non_touching_tile_sets(len(_RED_TOKENS))
+_RED_PLACEMENTS: List[List[Tuple[int, ...]]] = [
+    [tiles for tiles in _RED_SETS if desert not in tiles] for desert in range(NUM_TILES)
+]
+_RARE_PLACEMENTS = _non_touching_tile_sets(len(_RARE_TOKENS))
+
+
+class LayoutGenerator:
+    def __init__(self, seed: Optional[int] = None, rng: Optional[random.Random] = None):
+        """
+        Pass either a seed or an existing random.Random to make layouts reproducible
+        """
+        self.rng = rng if rng is not None else random.Random(seed)
+
+    def generate(self) -> BoardLayout:
+        rng = self.rng
+        resources = _RESOURCES[:]
+        rng.shuffle(resources)
+        desert = resources.index(Resource.DESERT.value)
+
+        numbers = [0] * NUM_TILES
+        numbers[desert] = -1
+
+        red_tiles = rng.choice(_RED_PLACEMENTS[desert])
+        red_tokens = _RED_TOKENS[:]
+        rng.shuffle(red_tokens)
+        for tile_id, number in zip(red_tiles, red_tokens):
+            numbers[tile_id] = number
+
+        # Any two free tiles that don't touch work, there are always plenty left
+        rare_tiles = rng.choice(
+            [
+                tiles
+                for tiles in _RARE_PLACEMENTS
+                if numbers[tiles[0]] == 0 and numbers[tiles[1]] == 0
+            ]
+        )
+        rare_tokens = _RARE_TOKENS[:]
+        rng.shuffle(rare_tokens)
+        for tile_id, number in zip(rare_tiles, rare_tokens):
+            numbers[tile_id] = number
+
+        other_tokens = _OTHER_TOKENS[:]
+        rng.shuffle(other_tokens)
+        free_tiles = [tile_id for tile_id in range(NUM_TILES) if numbers[tile_id] == 0]
+        for tile_id, number in zip(free_tiles, other_tokens):
+            numbers[tile_id] = number
+
+        return BoardLayout(tuple(resources), tuple(numbers))
+
+    def generate_batch(self, n: int) -> List[BoardLayout]:
+        return [self.generate() for _ in range(n)]
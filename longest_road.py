@@ -0,0 +1,180 @@
+"""
+Incremental Longest Road tracking.
+
+Each player's roads are split into connected components. Two roads are connected
+when they share a vertex that no opponent has built on. Finding the longest trail is
+an exponential search, so it only ever runs on the one component that a move touched:
+a new road merges the components at its ends, and an opponent's settlement can only
+split the component running through its vertex. Removing either, for undo, is the
+same in reverse. The current holder is kept up to date
+after every change and read in O(1).
+"""
+
+from typing import Dict, List, Optional, Set
+from topology import EDGE_VERTICES
+
+NUM_PLAYERS = 4
+MIN_LONGEST_ROAD = 5
+
+
+class LongestRoadTracker:
+    def __init__(self):
+        # Per player: vertex id -> ids of that player's roads touching it
+        self.road_adjacency: List[Dict[int, List[int]]] = [
+            {} for _ in range(NUM_PLAYERS)
+        ]
+        # Per player: road id -> component id, and component id -> road ids
+        self.component_of: List[Dict[int, int]] = [{} for _ in range(NUM_PLAYERS)]
+        self.components: List[Dict[int, Set[int]]] = [{} for _ in range(NUM_PLAYERS)]
+        self.component_length: List[Dict[int, int]] = [{} for _ in range(NUM_PLAYERS)]
+        # Vertex id -> index of the player who built there
+        self.buildings: Dict[int, int] = {}
+        self.lengths = [0] * NUM_PLAYERS
+        self.holder: Optional[int] = None
+        self._next_component = 0
+
+    def length(self, player: int) -> int:
+        return self.lengths[player]
+
+    def _is_blocked(self, player: int, vertex: int) -> bool:
+        owner = self.buildings.get(vertex)
+        return owner is not None and owner != player
+
+    def add_road(self, player: int, edge: int) -> None:
+        adjacency = self.road_adjacency[player]
+        touching: Set[int] = set()
+        for vertex in EDGE_VERTICES[edge]:
+            roads = adjacency.setdefault(vertex, [])
+            if not self._is_blocked(player, vertex):
+                touching.update(self.component_of[player][road] for road in roads)
+            roads.append(edge)
+
+        merged = {edge}
+        for component in touching:
+            merged |= self._pop_component(player, component)
+        self._add_component(player, merged)
+        self._update_length(player)
+
+    def add_settlement(self, player: int, vertex: int) -> None:
+        self.buildings[vertex] = player
+
+        # Opponent roads running through the vertex can't continue through it anymore
+        for other in range(NUM_PLAYERS):
+            roads = self.road_adjacency[other].get(vertex, [])
+            if other == player or len(roads) < 2:
+                continue
+            self._rebuild_components(
+                other, self._pop_component(other, self.component_of[other][roads[0]])
+            )
+            self._update_length(other)
+
+    def remove_road(self, player: int, edge: int) -> None:
+        # Taking a road out can only split the component it was part of
+        roads = self._pop_component(player, self.component_of[player][edge])
+        roads.discard(edge)
+        for vertex in EDGE_VERTICES[edge]:
+            self.road_adjacency[player][vertex].remove(edge)
+
+        self._rebuild_components(player, roads)
+        self._update_length(player)
+
+    def remove_settlement(self, vertex: int) -> None:
+        del self.buildings[vertex]
+
+        # Opponent roads on both sides of the vertex join back up
+        for player in range(NUM_PLAYERS):
+            roads = self.road_adjacency[player].get(vertex, [])
+            if len(roads) < 2:
+                continue
+            merged: Set[int] = set()
+            for component in {self.component_of[player][road] for road in roads}:
+                merged |= self._pop_component(player, component)
+            self._add_component(player, merged)
+            self._update_length(player)
+
+    def _pop_component(self, player: int, component: int) -> Set[int]:
+        roads = self.components[player].pop(component)
+        del self.component_length[player][component]
+        for road in roads:
+            del self.component_of[player][road]
+        return roads
+
+    def _add_component(self, player: int, roads: Set[int]) -> None:
+        component = self._next_component
+        self._next_component += 1
+        self.components[player][component] = roads
+        for road in roads:
+            self.component_of[player][road] = component
+        self.component_length[player][component] = self._longest_trail(player, roads)
+
+    def _rebuild_components(self, player: int, roads: Set[int]) -> None:
+        # Flood fill the roads into connected pieces under the current buildings
+        adjacency = self.road_adjacency[player]
+        remaining = set(roads)
+        while remaining:
+            start = remaining.pop()
+            piece = {start}
+            stack = [start]
+            while stack:
+                road = stack.pop()
+                for vertex in EDGE_VERTICES[road]:
+                    if self._is_blocked(player, vertex):
+                        continue
+                    for neighbor in adjacency[vertex]:
+                        if neighbor in remaining:
+                            remaining.remove(neighbor)
+                            piece.add(neighbor)
+                            stack.append(neighbor)
+            self._add_component(player, piece)
+
+    def _longest_trail(self, player: int, roads: Set[int]) -> int:
+        """
+        Longest path through the roads that never reuses a road, it may stop at an
+        opponent's building but not pass through it
+        """
+        adjacency = self.road_adjacency[player]
+        best = 0
+        used: Set[int] = set()
+
+        def walk(vertex: int, length: int) -> None:
+            nonlocal best
+            best = max(best, length)
+            if length and self._is_blocked(player, vertex):
+                return
+            for road in adjacency[vertex]:
+                if road in roads and road not in used:
+                    used.add(road)
+                    a, b = EDGE_VERTICES[road]
+                    walk(b if a == vertex else a, length + 1)
+                    used.remove(road)
+
+        # A longest trail starts at a dead end, a fork or a blocked vertex, only
+        # a closed loop has none of those
+        vertices = {vertex for road in roads for vertex in EDGE_VERTICES[road]}
+        starts = [
+            vertex
+            for vertex in vertices
+            if len(adjacency[vertex]) != 2 or self._is_blocked(player, vertex)
+        ] or list(vertices)
+        for vertex in starts:
+            walk(vertex, 0)
+
+        return best
+
+    def _update_length(self, player: int) -> None:
+        self.lengths[player] = max(self.component_length[player].values(), default=0)
+        self._update_holder()
+
+    def _update_holder(self) -> None:
+        best = max(self.lengths)
+        if best < MIN_LONGEST_ROAD:
+            self.holder = None
+            return
+        # The holder keeps it on a tie, otherwise it goes to a sole leader and is set
+        # aside when several players share the lead
+        if self.holder is not None and self.lengths[self.holder] == best:
+            return
+        leaders = [
+            player for player in range(NUM_PLAYERS) if self.lengths[player] == best
+        ]
+        self.holder = leaders[0] if len(leaders) == 1 else None
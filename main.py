@@ -1,11 +1,22 @@
+import argparse
 import pygame
 from game import Game
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Play Catan against the computer")
+    parser.add_argument(
+        "--fast-forward",
+        action="store_true",
+        help="Play computer turns instantly instead of one every --delay ms",
+    )
+    parser.add_argument("--delay", type=int, default=2000)
+    args = parser.parse_args()
+
     # Initiate pygame instance
     pygame.init()
-    Game()
+    Game(fast_forward=args.fast_forward, computer_delay=args.delay)
+    pygame.quit()
 
 
 main()
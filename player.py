@@ -1,9 +1,21 @@
-from constants import Color
+from constants import NUM_RESOURCE_TYPES, Color
 
 
 class Player:
+    __slots__ = ("id", "name", "color", "is_human", "resources")
+
     def __init__(self, id: int, name: str, is_human: bool):
-        self.id = int
+        self.id = id
         self.name = name
         self.color = Color.player_id_to_color(id)
         self.is_human = is_human
+        # Card counts indexed by RESOURCE_IDS
+        self.resources = [0] * NUM_RESOURCE_TYPES
+
+    def __eq__(self, other):
+        if not isinstance(other, Player):
+            return False
+        return self.id == other.id
+
+    def __hash__(self):
+        return self.id
@@ -0,0 +1,86 @@
+"""
+Pluggable decision makers for computer players.
+
+A policy picks the settlement and then the road for a settlement turn. Game holds one
+policy per seat, so bots can be mixed in the same game.
+"""
+
+import importlib
+from typing import List
+from edge import Edge
+from features import best_vertex, vertex_scores
+from player import Player
+from profiling import register
+from vertex import Vertex
+
+
+class Policy:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Decisions of every policy, wherever it is defined, are timed when profiling
+        for attribute in ("choose_settlement", "choose_road"):
+            if attribute in cls.__dict__:
+                register(cls, attribute, f"policy.{attribute}")
+
+    def choose_settlement(self, game, player: Player) -> Vertex:
+        raise NotImplementedError
+
+    def choose_road(self, game, player: Player, vertex: Vertex) -> Edge:
+        raise NotImplementedError
+
+
+class HeuristicPolicy(Policy):
+    """
+    Settle on the best summed dice probability, then build a random road off it.
+    The weights add a bonus per different resource a spot produces and for a port,
+    the plain heuristic leaves both at 0.
+    """
+
+    def __init__(self, diversity_weight: float = 0.0, port_weight: float = 0.0):
+        self.diversity_weight = diversity_weight
+        self.port_weight = port_weight
+
+    def choose_settlement(self, game, player: Player) -> Vertex:
+        board = game.board
+        scores = vertex_scores(
+            board.vertex_features, self.diversity_weight, self.port_weight
+        )
+        return board.vertices[best_vertex(scores, board.settleable_mask)]
+
+    def choose_road(self, game, player: Player, vertex: Vertex) -> Edge:
+        possible_edges = game.board.get_list_of_edges_off_vertex(vertex)
+        return game.rng.choice(possible_edges)
+
+
+class RandomPolicy(Policy):
+    def choose_settlement(self, game, player: Player) -> Vertex:
+        return game.rng.choice(game.board.get_list_of_settleable_vertices())
+
+    def choose_road(self, game, player: Player, vertex: Vertex) -> Edge:
+        return game.rng.choice(game.board.get_list_of_edges_off_vertex(vertex))
+
+
+POLICIES = {
+    "heuristic": HeuristicPolicy,
+    "random": RandomPolicy,
+}
+
+
+def load_policy(name: str) -> Policy:
+    """
+    Build a policy from a registered name or from "module:attribute", where the
+    attribute is a Policy subclass or any callable returning a Policy
+    """
+    if name in POLICIES:
+        return POLICIES[name]()
+
+    module_name, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(
+            f"Unknown policy {name!r}, use one of {sorted(POLICIES)} or module:attribute"
+        )
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+def load_policies(names: List[str]) -> List[Policy]:
+    return [load_policy(name) for name in names]
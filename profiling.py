@@ -0,0 +1,238 @@
+"""
+Opt-in call counters and timers.
+
+Methods worth watching are marked with @profiled("area.name"). Marking a method
+only records it, the class keeps the plain function, so a disabled profiler costs
+nothing at all. enable() swaps in wrappers that count calls and add up wall time
+per name, disable() puts the plain functions back. pygame's display flips and
+partial updates are counted the same way.
+
+Each counter has its inclusive time and its self time, which leaves out the time
+spent in other marked methods it called. Self times never overlap, so they add up
+per area, which is how summaries split the time:
+    board, game     simulation
+    policy          AI decisions
+    render, display drawing
+
+Setting CATAN_PROFILE=1 enables profiling at import, CATAN_PROFILE_INTERVAL=<seconds>
+also dumps the counters as a JSON line to stderr that often.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+AREAS = {
+    "board": "simulation",
+    "game": "simulation",
+    "policy": "ai",
+    "render": "drawing",
+    "display": "drawing",
+}
+
+
+class Counter:
+    __slots__ = ("calls", "seconds", "self_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.self_seconds = 0.0
+
+
+counters: Dict[str, Counter] = {}
+# (owner, attribute, counter name) of every marked method
+_registry: List[Tuple[Any, str, str]] = []
+_originals: Dict[Tuple[Any, str], Callable] = {}
+_enabled = False
+_dump_thread: Optional[threading.Thread] = None
+_dump_stop = threading.Event()
+# Per thread, time spent in marked methods called by the one running now there
+_child_seconds = threading.local()
+
+
+def _counter(name: str) -> Counter:
+    counter = counters.get(name)
+    if counter is None:
+        counter = counters[name] = Counter()
+    return counter
+
+
+def _timed(function: Callable, name: str) -> Callable:
+    counter = _counter(name)
+    perf_counter = time.perf_counter
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        child_seconds = _child_seconds
+        outer_child_seconds = getattr(child_seconds, "seconds", 0.0)
+        child_seconds.seconds = 0.0
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            counter.calls += 1
+            counter.seconds += elapsed
+            counter.self_seconds += elapsed - child_seconds.seconds
+            child_seconds.seconds = outer_child_seconds + elapsed
+
+    return wrapper
+
+
+def _patch(owner: Any, attribute: str, name: str) -> None:
+    original = owner.__dict__[attribute]
+    _originals[(owner, attribute)] = original
+    setattr(owner, attribute, _timed(original, name))
+
+
+class profiled:
+    """
+    Decorator for methods, records the method under name and leaves it untouched
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.function: Optional[Callable] = None
+
+    def __call__(self, function: Callable) -> "profiled":
+        self.function = function
+        return self
+
+    def __set_name__(self, owner: Any, attribute: str) -> None:
+        setattr(owner, attribute, self.function)
+        register(owner, attribute, self.name)
+
+
+def register(owner: Any, attribute: str, name: str) -> None:
+    # Methods can be registered at any time, late ones are wrapped straight away
+    _registry.append((owner, attribute, name))
+    if _enabled:
+        _patch(owner, attribute, name)
+        _patch_pygame()
+
+
+def _patch_pygame() -> None:
+    # Drawing is only counted once something has loaded pygame
+    pygame = sys.modules.get("pygame")
+    if pygame is not None and (pygame.display, "flip") not in _originals:
+        _patch(pygame.display, "flip", "display.flip")
+        _patch(pygame.display, "update", "display.update")
+
+
+def enable(
+    dump_interval: Optional[float] = None, dump_file: TextIO = sys.stderr
+) -> None:
+    """
+    Start counting. With a dump_interval the counters are also written to
+    dump_file as one JSON line every dump_interval seconds.
+    """
+    global _enabled, _dump_thread
+    if not _enabled:
+        _enabled = True
+        for owner, attribute, name in _registry:
+            _patch(owner, attribute, name)
+        _patch_pygame()
+
+    if dump_interval and _dump_thread is None:
+        _dump_stop.clear()
+        _dump_thread = threading.Thread(
+            target=_dump_loop, args=(dump_interval, dump_file), daemon=True
+        )
+        _dump_thread.start()
+
+
+def disable() -> None:
+    global _enabled, _dump_thread
+    if _dump_thread is not None:
+        _dump_stop.set()
+        _dump_thread.join()
+        _dump_thread = None
+    for (owner, attribute), original in _originals.items():
+        setattr(owner, attribute, original)
+    _originals.clear()
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    for counter in counters.values():
+        counter.calls = 0
+        counter.seconds = 0.0
+        counter.self_seconds = 0.0
+
+
+def snapshot(clear: bool = False) -> Dict[str, Dict[str, float]]:
+    """
+    Calls, inclusive and self seconds per counter that has been hit, optionally
+    resetting them afterwards
+    """
+    result = {
+        name: {
+            "calls": counter.calls,
+            "seconds": counter.seconds,
+            "self_seconds": counter.self_seconds,
+        }
+        for name, counter in sorted(counters.items())
+        if counter.calls
+    }
+    if clear:
+        reset()
+    return result
+
+
+def merge(
+    total: Dict[str, Dict[str, float]], other: Dict[str, Dict[str, float]]
+) -> None:
+    # Add one snapshot into another, e.g. to combine worker processes
+    for name, counter in other.items():
+        entry = total.setdefault(
+            name, {"calls": 0, "seconds": 0.0, "self_seconds": 0.0}
+        )
+        for key in entry:
+            entry[key] += counter[key]
+
+
+def summary(counts: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+    # Readable table of a snapshot, the current counters by default
+    if counts is None:
+        counts = snapshot()
+
+    lines = []
+    for name, counter in counts.items():
+        per_call = counter["seconds"] / counter["calls"] * 1e6
+        lines.append(
+            f"{name:>30}: {counter['calls']:>9} calls {counter['seconds']:9.3f}s "
+            f"({counter['self_seconds']:.3f}s self) {per_call:9.1f}us/call"
+        )
+    for area, seconds in area_seconds(counts).items():
+        lines.append(f"{area:>30}: {seconds:9.3f}s")
+    return "\n".join(lines)
+
+
+def area_seconds(counts: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    seconds = {area: 0.0 for area in dict.fromkeys(AREAS.values())}
+    for name, counter in counts.items():
+        area = AREAS.get(name.split(".")[0])
+        if area is not None:
+            seconds[area] += counter["self_seconds"]
+    return seconds
+
+
+def _dump_loop(interval: float, file: TextIO) -> None:
+    while not _dump_stop.wait(interval):
+        file.write(
+            json.dumps({"time": time.time(), "pid": os.getpid(), **snapshot()}) + "\n"
+        )
+        file.flush()
+
+
+if os.environ.get("CATAN_PROFILE"):
+    enable(float(os.environ.get("CATAN_PROFILE_INTERVAL", 0)) or None)
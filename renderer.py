@@ -0,0 +1,204 @@
+from __future__ import annotations
+from typing import List, Optional
+import pygame
+from constants import Color
+from player import Player
+from profiling import profiled
+from vertex import Vertex
+from edge import Edge
+
+
+class Renderer:
+    """
+    Draws a board onto a pygame surface. The board holds the game state and only
+    notifies the renderer when one is attached, so headless games never touch pygame.
+
+    The static board (tiles, numbers, empty edges) is drawn once into a background
+    surface. After that every draw only marks the rectangles it touched and
+    present() pushes just those to the display instead of flipping the whole screen.
+    Set defer_updates to batch many moves into a single present() call.
+    """
+
+    def __init__(self, screen: pygame.Surface, defer_updates: bool = False):
+        self.screen = screen
+        self.background: Optional[pygame.Surface] = None
+        self.dirty_rects: List[pygame.Rect] = []
+        self.defer_updates = defer_updates
+        # Settleable vertices as of the last redraw, as a board.settleable_mask
+        self.drawn_settleable_mask = 0
+        self.turn_text_rect: Optional[pygame.Rect] = None
+        self._font: Optional[pygame.font.Font] = None
+
+    @property
+    def font(self) -> pygame.font.Font:
+        # Loading a font is slow, so it happens once, on first use
+        if self._font is None:
+            self._font = pygame.font.Font(None, 36)
+        return self._font
+
+    def present(self) -> None:
+        if self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+            self.dirty_rects = []
+
+    def _mark_dirty(self, rect: pygame.Rect) -> None:
+        self.dirty_rects.append(rect)
+        if not self.defer_updates:
+            self.present()
+
+    @profiled("render.board")
+    def display_board(self, board) -> None:
+        self.background = pygame.Surface(self.screen.get_size())
+        self.background.fill(Color.BACKGROUND.to_rgb())
+
+        # For showing tiles
+        font = self.font
+        for tile in board.tiles:
+            pygame.draw.polygon(self.background, tile.color, tile.points)
+
+            if tile.number != -1:
+                text_surface = font.render(
+                    str(tile.number), True, Color.OUTLINE.to_rgb()
+                )  # Create text surface
+                text_rect = text_surface.get_rect(
+                    center=(tile.x, tile.y)
+                )  # Center the rectangle
+                self.background.blit(
+                    text_surface, text_rect.topleft
+                )  # Draw text at adjusted position
+
+        # For showing edges
+        for edge in board.edges:
+            pygame.draw.line(
+                self.background,
+                Color.EDGE.to_rgb(),
+                edge.vertex_set[0].coordinate,
+                edge.vertex_set[1].coordinate,
+                10,
+            )
+
+        self.screen.blit(self.background, (0, 0))
+
+        # Anything already built, in case the renderer was attached mid game
+        for edge in board.edges:
+            if edge.road:
+                self._draw_road(edge, edge.road)
+        for vertex in board.vertices:
+            if vertex.is_city:
+                self._draw_city(vertex, vertex.settlement)
+            elif vertex.settlement:
+                self._draw_settlement(vertex, vertex.settlement)
+
+        # For showing vertices
+        for vertex in board.get_list_of_settleable_vertices():
+            pygame.draw.circle(self.screen, Color.VERTEX.to_rgb(), vertex.coordinate, 5)
+        self.drawn_settleable_mask = board.settleable_mask
+        self.turn_text_rect = None
+
+        # The one place the whole screen changes
+        self.dirty_rects = []
+        pygame.display.flip()
+
+    def _draw_settlement(self, vertex: Vertex, player: Player) -> pygame.Rect:
+        width, height = 28, 21
+        x, y = vertex.coordinate[0] - width // 2, vertex.coordinate[1] - height // 2
+
+        roof_points = [
+            (x, y),
+            (x + width // 2, y - height // 2),
+            (x + width, y),
+        ]
+
+        body = pygame.draw.rect(self.screen, player.color, (x, y, width, height))
+        roof = pygame.draw.polygon(self.screen, player.color, roof_points)
+        return body.union(roof)
+
+    def _draw_city(self, vertex: Vertex, player: Player) -> pygame.Rect:
+        # A settlement with a taller block next to it
+        width, height = 36, 24
+        x, y = vertex.coordinate[0] - width // 2, vertex.coordinate[1] - height // 2
+
+        roof_points = [
+            (x, y),
+            (x + width // 4, y - height // 2),
+            (x + width // 2, y),
+        ]
+
+        body = pygame.draw.rect(self.screen, player.color, (x, y, width, height))
+        tower = pygame.draw.rect(
+            self.screen,
+            player.color,
+            (x + width // 2, y - height // 2, width // 2, height),
+        )
+        roof = pygame.draw.polygon(self.screen, player.color, roof_points)
+        return body.union(tower).union(roof)
+
+    def _draw_road(self, edge: Edge, player: Player) -> pygame.Rect:
+        return pygame.draw.line(
+            self.screen,
+            player.color,
+            edge.vertex_set[0].coordinate,
+            edge.vertex_set[1].coordinate,
+            10,
+        )
+
+    @profiled("render.settlement")
+    def draw_settlement(self, vertex: Vertex, player: Player) -> None:
+        self._mark_dirty(self._draw_settlement(vertex, player))
+
+    @profiled("render.city")
+    def draw_city(self, vertex: Vertex, player: Player) -> None:
+        self._mark_dirty(self._draw_city(vertex, player))
+
+    @profiled("render.road")
+    def draw_road(self, edge: Edge, player: Player) -> None:
+        self._mark_dirty(self._draw_road(edge, player))
+
+    @profiled("render.settleable_vertices")
+    def redraw_settleable_vertices(self, board) -> None:
+        # Only vertices whose settleable state flipped since the last redraw change
+        changed = self.drawn_settleable_mask ^ board.settleable_mask
+        self.drawn_settleable_mask = board.settleable_mask
+        while changed:
+            lowest_bit = changed & -changed
+            changed ^= lowest_bit
+            vertex = board.vertices[lowest_bit.bit_length() - 1]
+            if vertex.settlement:
+                continue
+
+            color = Color.VERTEX if board.is_settleable(vertex) else Color.EDGE
+            self.dirty_rects.append(
+                pygame.draw.circle(self.screen, color.to_rgb(), vertex.coordinate, 5)
+            )
+
+        if not self.defer_updates:
+            self.present()
+
+    @profiled("render.text")
+    def show_whose_turn(self, player: Player) -> None:
+        # Show who is currently settling in the bottom left
+        font = self.font
+        computer_str = "(Computer)"
+        if player.is_human:
+            computer_str = ""
+
+        text = "It is " + player.name + "'s turn! " + computer_str
+
+        text_surface = font.render(text, True, player.color)
+        text_rect = text_surface.get_rect()
+
+        padding = 10
+        text_rect.topleft = (
+            padding,
+            self.screen.get_height() - text_rect.height - padding,
+        )
+
+        # Clear whatever the previous, possibly longer, text covered
+        area = text_rect
+        if self.turn_text_rect:
+            area = text_rect.union(self.turn_text_rect)
+        self.screen.fill(Color.BACKGROUND.to_rgb(), area)
+        self.screen.blit(text_surface, text_rect)
+        self.turn_text_rect = text_rect
+
+        self._mark_dirty(area)
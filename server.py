@@ -0,0 +1,484 @@
+"""
+Asyncio server hosting many headless games at once.
+
+Clients talk line delimited JSON over TCP, one object per line. Every request has a
+"type", anything else depends on it:
+
+    {"type": "create", "seats": [0, 2], "seed": 7}
+        New table. The listed seats (player indexes 0-3) are for clients, the rest
+        are played by the heuristic. The seed is optional, an integer from 0 to
+        2**64 - 1.
+        -> {"type": "created", "table": id, "seed": seed}
+
+    {"type": "join", "table": id, "seat": 0}
+        Take a client seat, or watch the table when "seat" is left out. The table
+        starts once every client seat is taken.
+        -> {"type": "joined", "table": id, "seat": 0, "layout": {...}, "actions": [...],
+            "current_player": 0, "phase": 0}
+
+    {"type": "move", "table": id, "action": 12}
+        Play an action id (see actions.py) for the seat that is up. Checked with
+        Vertex.check_if_can_build_settlement and Edge.check_if_can_build_road.
+
+    {"type": "leave", "table": id}
+        Give up a seat or stop watching, disconnecting leaves every table.
+        -> {"type": "left", "table": id}
+
+    {"type": "stats"} or {"type": "stats", "table": id}
+        -> {"type": "stats", ...} latency and throughput, for the server or a table
+
+A table nobody is seated at or watching is dropped once it is finished, once it
+started and every player left, or, before it starts, once the connection that
+created it is gone. Its numbers stay in the server stats, unfinished ones are
+counted as abandoned.
+
+Boards are only sent whole on join. After that every change to a table reaches all
+of its clients as a diff: the moves played (a client's own move followed by any
+computer turns it set off), who is up next and the phase. The client whose turn it
+is also gets its legal actions. Bad requests get {"type": "error", "message": ...}.
+
+Example:
+    python server.py --port 8765
+    python server.py --loopback 1000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional, Set
+from actions import ActionType, decode_action
+from constants import GamePhase
+from game import Game
+from game_record import check_seed
+
+NUM_PLAYERS = 4
+
+
+class Connection:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        # Table id -> seat this connection plays there, None when only watching
+        self.tables: Dict[int, Optional[int]] = {}
+        # Ids of the tables it created that are still around
+        self.created: Set[int] = set()
+
+    def send(self, message: Dict[str, Any]) -> None:
+        self.writer.write((json.dumps(message) + "\n").encode())
+
+
+class Table:
+    def __init__(self, table_id: int, seed: int, client_seats: List[int]):
+        self.id = table_id
+        self.game = Game(headless=True, seed=seed)
+        self.client_seats = set(client_seats)
+        self.seats: Dict[int, Connection] = {}
+        self.watchers: Set[Connection] = set()
+        # Keeps the table around until it starts, None once it disconnected
+        self.creator: Optional[Connection] = None
+        self.started = False
+
+        # Stats for moves sent by clients, from receiving the line to queuing diffs
+        self.moves = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.first_move: Optional[float] = None
+        self.last_move: Optional[float] = None
+
+    @property
+    def over(self) -> bool:
+        return self.game.game_phase == GamePhase.NON_SETTLEMENT.value
+
+    def state(self) -> Dict[str, Any]:
+        layout = self.game.board.layout
+        return {
+            "layout": {
+                "resources": list(layout.resources),
+                "numbers": list(layout.numbers),
+            },
+            "actions": list(self.game.actions),
+            "current_player": self.game.current_player_index,
+            "phase": self.game.game_phase,
+        }
+
+    def validate(self, seat: Optional[int], action: Any) -> Optional[str]:
+        # Reason the move is illegal, or None if it can be played
+        game = self.game
+        if not self.started:
+            return "The table is still waiting for players"
+        if self.over:
+            return "The settlement phase is over"
+        if seat != game.current_player_index:
+            return "It is not your turn"
+        if not isinstance(action, int) or isinstance(action, bool):
+            return f"Unknown action {action!r}"
+        try:
+            action_type, index = decode_action(action)
+        except ValueError as error:
+            return str(error)
+
+        if action_type == ActionType.SETTLE:
+            if game.game_phase != GamePhase.SETTLEMENT_0.value:
+                return "Build your road first"
+            if not game.board.vertices[index].check_if_can_build_settlement():
+                return f"Vertex {index} can't be settled"
+        elif action_type == ActionType.ROAD:
+            edge = game.board.edges[index]
+            if not edge.check_if_can_build_road(
+                game.board.edges,
+                game.players[seat],
+                game.game_phase,
+                game.current_vertex,
+            ):
+                return f"A road can't be built on edge {index}"
+        else:
+            return "Turns can't be ended before the settlement phase is over"
+
+        return None
+
+    def play_computers(self) -> None:
+        # Computer seats move until a client is up or the settlement phase ends
+        game = self.game
+        while not self.over and game.current_player_index not in self.client_seats:
+            game.computer_settlement_phase(game.players[game.current_player_index])
+
+    def broadcast(self, first_action: int) -> None:
+        """
+        Send every client the moves from game.actions[first_action:] and who is up
+        """
+        game = self.game
+        moves = []
+        for number, action in enumerate(
+            game.actions[first_action:], start=first_action
+        ):
+            # Two actions per turn, in snake draft order
+            turn = number // 2
+            moves.append(
+                {"player": turn if turn < NUM_PLAYERS else 7 - turn, "action": action}
+            )
+
+        diff = {
+            "type": "moves",
+            "table": self.id,
+            "moves": moves,
+            "current_player": game.current_player_index,
+            "phase": game.game_phase,
+        }
+        for connection in self.watchers:
+            connection.send(diff)
+        for seat, connection in self.seats.items():
+            if seat == game.current_player_index and not self.over:
+                connection.send({**diff, "legal": game.get_legal_actions()})
+            else:
+                connection.send(diff)
+
+    def record_latency(self, received: float) -> float:
+        now = time.perf_counter()
+        latency = now - received
+        self.moves += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        if self.first_move is None:
+            self.first_move = now
+        self.last_move = now
+        return latency
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = self.last_move - self.first_move if self.moves > 1 else 0.0
+        return {
+            "table": self.id,
+            "moves": self.moves,
+            "mean_latency_ms": (
+                self.latency_total / self.moves * 1000 if self.moves else 0.0
+            ),
+            "max_latency_ms": self.latency_max * 1000,
+            "moves_per_sec": (self.moves - 1) / elapsed if elapsed else 0.0,
+            "over": self.over,
+        }
+
+
+class GameServer:
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.tables: Dict[int, Table] = {}
+        self.connections: Set[Connection] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self.started = time.perf_counter()
+        # Totals over every table, including the ones already dropped
+        self.moves = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.finished_tables = 0
+        self.abandoned_tables = 0
+        self._next_table = 0
+        self.server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        # Returns the port, pass 0 to pick a free one
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self.server.close()
+        # Hanging up on clients ends their handlers before the server goes away
+        for connection in list(self.connections):
+            connection.writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        connection = Connection(writer)
+        self.connections.add(connection)
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                    self.handle_request(connection, request, received)
+                except (ValueError, KeyError, TypeError) as error:
+                    connection.send({"type": "error", "message": str(error)})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.disconnect(connection)
+            self._handlers.discard(handler)
+            writer.close()
+
+    def disconnect(self, connection: Connection) -> None:
+        self.connections.discard(connection)
+        for table_id in list(connection.tables):
+            self.leave_table(connection, table_id)
+        for table_id in list(connection.created):
+            table = self.tables[table_id]
+            table.creator = None
+            self._drop_if_unattended(table)
+
+    def leave_table(self, connection: Connection, table_id: int) -> None:
+        seat = connection.tables.pop(table_id)
+        table = self.tables.get(table_id)
+        if table is None:
+            return
+        table.watchers.discard(connection)
+        if seat is not None and table.seats.get(seat) is connection:
+            del table.seats[seat]
+        self._drop_if_unattended(table)
+
+    def _drop_if_unattended(self, table: Table) -> None:
+        # A table nobody is at can only wait for players while its creator is around
+        if table.seats or table.watchers:
+            return
+        if not (table.over or table.started or table.creator is None):
+            return
+        del self.tables[table.id]
+        if table.creator is not None:
+            table.creator.created.discard(table.id)
+        if not table.over:
+            self.abandoned_tables += 1
+
+    def handle_request(
+        self, connection: Connection, request: Dict[str, Any], received: float
+    ) -> None:
+        kind = request["type"]
+        if kind == "create":
+            self.create_table(connection, request)
+        elif kind == "join":
+            self.join_table(connection, request)
+        elif kind == "move":
+            self.move(connection, request, received)
+        elif kind == "leave":
+            if request["table"] not in connection.tables:
+                raise ValueError(f"You are not at table {request['table']!r}")
+            self.leave_table(connection, request["table"])
+            connection.send({"type": "left", "table": request["table"]})
+        elif kind == "stats":
+            connection.send(self.stats(request.get("table")))
+        else:
+            raise ValueError(f"Unknown request type {kind!r}")
+
+    def _table(self, request: Dict[str, Any]) -> Table:
+        table = self.tables.get(request["table"])
+        if table is None:
+            raise ValueError(f"No table {request['table']!r}")
+        return table
+
+    def create_table(self, connection: Connection, request: Dict[str, Any]) -> None:
+        seats = request.get("seats", [0])
+        if not all(seat in range(NUM_PLAYERS) for seat in seats):
+            raise ValueError("Seats are player indexes from 0 to 3")
+        seed = request.get("seed")
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        check_seed(seed)
+
+        table = Table(self._next_table, seed, seats)
+        self._next_table += 1
+        self.tables[table.id] = table
+        table.creator = connection
+        connection.created.add(table.id)
+        connection.send({"type": "created", "table": table.id, "seed": seed})
+        if not seats:
+            self.start_table(table)
+
+    def join_table(self, connection: Connection, request: Dict[str, Any]) -> None:
+        table = self._table(request)
+        seat = request.get("seat")
+        if table.id in connection.tables:
+            raise ValueError(f"You already joined table {table.id}")
+        if seat is None:
+            table.watchers.add(connection)
+        elif seat not in table.client_seats:
+            raise ValueError(f"Seat {seat!r} is played by the computer")
+        elif seat in table.seats:
+            raise ValueError(f"Seat {seat} is taken")
+        else:
+            table.seats[seat] = connection
+        connection.tables[table.id] = seat
+
+        connection.send(
+            {"type": "joined", "table": table.id, "seat": seat, **table.state()}
+        )
+        if not table.started and len(table.seats) == len(table.client_seats):
+            self.start_table(table)
+
+    def start_table(self, table: Table) -> None:
+        table.started = True
+        first_action = len(table.game.actions)
+        table.play_computers()
+        table.broadcast(first_action)
+        self._finish_if_over(table)
+
+    def _finish_if_over(self, table: Table) -> None:
+        if table.over:
+            self.finished_tables += 1
+            self._drop_if_unattended(table)
+
+    def move(
+        self, connection: Connection, request: Dict[str, Any], received: float
+    ) -> None:
+        table = self._table(request)
+        seat = connection.tables.get(table.id)
+        action = request["action"]
+        reason = table.validate(seat, action)
+        if reason:
+            connection.send({"type": "error", "table": table.id, "message": reason})
+            return
+
+        first_action = len(table.game.actions)
+        table.game.apply_action(action)
+        table.play_computers()
+        table.broadcast(first_action)
+        latency = table.record_latency(received)
+        self.moves += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self._finish_if_over(table)
+
+    def stats(self, table_id: Optional[int] = None) -> Dict[str, Any]:
+        if table_id is not None:
+            return {"type": "stats", **self._table({"table": table_id}).stats()}
+
+        return {
+            "type": "stats",
+            "tables": len(self.tables),
+            "finished_tables": self.finished_tables,
+            "abandoned_tables": self.abandoned_tables,
+            "connections": len(self.connections),
+            "moves": self.moves,
+            "moves_per_sec": self.moves / (time.perf_counter() - self.started),
+            "mean_latency_ms": (
+                self.latency_total / self.moves * 1000 if self.moves else 0.0
+            ),
+            "max_latency_ms": self.latency_max * 1000,
+        }
+
+
+async def _bot(host: str, port: int, seat: int, seed: int) -> None:
+    # A client that creates its own table and plays one seat with random legal moves
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+
+    def send(message: Dict[str, Any]) -> None:
+        writer.write((json.dumps(message) + "\n").encode())
+
+    send({"type": "create", "seats": [seat], "seed": seed})
+    created = json.loads(await reader.readline())
+    send({"type": "join", "table": created["table"], "seat": seat})
+    while True:
+        message = json.loads(await reader.readline())
+        if message["type"] == "error":
+            raise RuntimeError(message["message"])
+        if message["type"] != "moves":
+            continue
+        if message["phase"] == GamePhase.NON_SETTLEMENT.value:
+            break
+        if "legal" in message:
+            send(
+                {
+                    "type": "move",
+                    "table": created["table"],
+                    "action": rng.choice(message["legal"]),
+                }
+            )
+            await writer.drain()
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def loopback(tables: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Play tables games against a local server, each with one bot client and three
+    computer seats, and return the server's stats
+    """
+    server = GameServer(seed)
+    port = await server.start()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_bot("127.0.0.1", port, i % NUM_PLAYERS, seed + i) for i in range(tables))
+    )
+    elapsed = time.perf_counter() - start
+    stats = server.stats()
+    await server.close()
+    stats["seconds"] = elapsed
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Host headless Catan tables")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "--loopback",
+        type=int,
+        metavar="TABLES",
+        help="Instead of serving, play this many tables with local bot clients "
+        "and print the stats",
+    )
+    args = parser.parse_args()
+
+    if args.loopback:
+        stats = asyncio.run(loopback(args.loopback, args.seed or 0))
+        print(json.dumps(stats, indent=2))
+        return
+
+    async def serve() -> None:
+        server = GameServer(args.seed)
+        port = await server.start(args.host, args.port)
+        print(f"serving on {args.host}:{port}")
+        await server.server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
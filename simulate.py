@@ -0,0 +1,182 @@
+"""
+Headless self-play runner.
+
+Plays many settlement phases across a process pool and streams one JSON line per game
+to disk. The game stops after the settlement phase for now, so the winner is the
+player whose settlements are most likely to produce on a roll.
+
+Example:
+    python simulate.py --games 10000 --workers 8 --policies heuristic,random
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+from typing import Any, Dict, List, Optional, Tuple
+import profiling
+from constants import GamePhase
+from game import Game
+from policy import load_policies
+from trajectory_store import DEFAULT_CHUNK_SIZE, StepRecorder, TrajectoryWriter
+
+# Set in each worker process when trajectories are being stored
+_trajectory_writer: Optional[TrajectoryWriter] = None
+_step_recorder: Optional[StepRecorder] = None
+
+
+def _init_worker(profile: bool, trajectory_dir: Optional[str], chunk_size: int) -> None:
+    global _trajectory_writer, _step_recorder
+    if profile:
+        profiling.enable()
+    if trajectory_dir:
+        _trajectory_writer = TrajectoryWriter(trajectory_dir, chunk_size=chunk_size)
+        _step_recorder = StepRecorder()
+
+
+def play_game(task: Tuple[int, int, List[str]]) -> Dict[str, Any]:
+    game_index, seed, policy_names = task
+    start = time.perf_counter()
+    policies = load_policies(policy_names)
+    if _step_recorder is not None:
+        # Steps are recorded as the moves are chosen, the game is never replayed
+        policies = [_step_recorder.wrap(policy) for policy in policies]
+    game = Game(headless=True, policies=policies, seed=seed + game_index)
+
+    steps = 0
+    while game.game_phase != GamePhase.NON_SETTLEMENT.value:
+        game.computer_settlement_phase(game.players[game.current_player_index])
+        # A settlement and its road
+        steps += 2
+
+    placements: List[Dict[str, List[int]]] = [
+        {"settlements": [], "roads": []} for _ in game.players
+    ]
+    for vertex in game.board.vertices:
+        if vertex.settlement:
+            placements[vertex.settlement.id - 1]["settlements"].append(vertex.id)
+    for edge in game.board.edges:
+        if edge.road:
+            placements[edge.road.id - 1]["roads"].append(edge.id)
+
+    production = game.board.get_expected_production()
+    result = {
+        "game": game_index,
+        "seed": game.seed,
+        "winner": production.index(max(production)) + 1,
+        "turns": game.number_of_turns,
+        "steps": steps,
+        "expected_production": production,
+        "placements": placements,
+        "policies": policy_names,
+        "worker": os.getpid(),
+        "seconds": time.perf_counter() - start,
+        # Counters for just this game, empty unless profiling is on
+        "profile": profiling.snapshot(clear=True),
+    }
+
+    # Outside the timed and profiled game, storing is bookkeeping
+    if _trajectory_writer is not None:
+        _trajectory_writer.append(_step_recorder.take(game.seed))
+    return result
+
+
+def run(
+    games: int,
+    workers: int,
+    seed: int,
+    policy_names: List[str],
+    output: str,
+    profile: bool = False,
+    trajectory_dir: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[int, Dict[str, float]]:
+    tasks = [(i, seed, policy_names) for i in range(games)]
+    stats: Dict[int, Dict[str, float]] = defaultdict(
+        lambda: {"games": 0, "steps": 0, "seconds": 0.0}
+    )
+    wins = [0] * len(policy_names)
+    profile_totals: Dict[str, Dict[str, float]] = {}
+
+    start = time.perf_counter()
+    with open(output, "w") as file, Pool(
+        workers, _init_worker, (profile, trajectory_dir, chunk_size)
+    ) as pool:
+        chunksize = max(1, games // (workers * 16))
+        for result in pool.imap_unordered(play_game, tasks, chunksize=chunksize):
+            file.write(json.dumps(result) + "\n")
+            worker = stats[result["worker"]]
+            worker["games"] += 1
+            worker["steps"] += result["steps"]
+            worker["seconds"] += result["seconds"]
+            wins[result["winner"] - 1] += 1
+            profiling.merge(profile_totals, result["profile"])
+    elapsed = time.perf_counter() - start
+
+    for pid, worker in sorted(stats.items()):
+        print(
+            f"worker {pid}: {worker['games']} games, "
+            f"{worker['games'] / worker['seconds']:.1f} games/sec, "
+            f"{worker['steps'] / worker['seconds']:.1f} steps/sec"
+        )
+    total_steps = sum(worker["steps"] for worker in stats.values())
+    print(
+        f"total: {games} games in {elapsed:.2f}s, {games / elapsed:.1f} games/sec, "
+        f"{total_steps / elapsed:.1f} steps/sec"
+    )
+    for seat, (name, count) in enumerate(zip(policy_names, wins)):
+        print(f"seat {seat + 1} ({name}): {count} wins")
+    if profile:
+        print(profiling.summary(profile_totals))
+
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run headless Catan self-play")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--policies",
+        default="heuristic",
+        help="Comma separated policy per seat, shorter lists repeat across the seats. "
+        "Names are heuristic, random or module:attribute",
+    )
+    parser.add_argument("--output", default="simulation_results.jsonl")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Count calls and time per engine, policy and drawing method",
+    )
+    parser.add_argument(
+        "--trajectories",
+        metavar="DIR",
+        help="Also append every step to a trajectory store in DIR, see "
+        "trajectory_store.py",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    # Shorter lists repeat across the seats, heuristic,random alternates them
+    policy_names = args.policies.split(",")
+    if len(policy_names) > 4:
+        parser.error("--policies takes at most one policy per seat")
+    policy_names = (policy_names * 4)[:4]
+
+    run(
+        args.games,
+        args.workers,
+        args.seed,
+        policy_names,
+        args.output,
+        args.profile,
+        args.trajectories,
+        args.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
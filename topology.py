@@ -0,0 +1,127 @@
+"""
+Static board topology shared by every game.
+
+The layout of tiles, vertices and edges never changes between games, only the
+resources and numbers on the tiles do. Everything here is built once at import and
+indexed by small integer ids:
+
+    tile ids    0-18 in grid order (q across, r angled down)
+    vertex ids  0-53 sorted top to bottom then left to right (port label = id + 1)
+    edge ids    0-71 sorted by their (lower, higher) vertex ids
+"""
+
+import math
+from typing import Dict, List, Tuple
+from constants import HEX_SIZE, OFFSET_Q, OFFSET_R, Port
+
+
+def hex_to_pixel(q: int, r: int) -> Tuple[float, float]:
+    x = HEX_SIZE * (math.sqrt(3) / 2 * q + math.sqrt(3) * r)
+    y = HEX_SIZE * (3 / 2 * q)
+    return x, y
+
+
+def _build_topology():
+    # q is straight across (basically x)
+    # r is angled down (disturbed y)
+    tile_coordinates = [
+        (q, r) for q in range(0, 5) for r in range(0, 5) if not (q + r < 2 or q + r > 6)
+    ]
+
+    tile_centers = []
+    tile_points = []
+    for q, r in tile_coordinates:
+        x, y = hex_to_pixel(q + OFFSET_Q, r + OFFSET_R)
+        tile_centers.append((x, y))
+        tile_points.append(
+            tuple(
+                (
+                    round(x + HEX_SIZE * math.sin(math.radians(60 * i)), 0),
+                    round(y + HEX_SIZE * math.cos(math.radians(60 * i)), 0),
+                )
+                for i in range(6)
+            )
+        )
+
+    # Corners shared between tiles round to the same pixel, so they dedupe by value
+    vertex_coordinates = sorted(
+        {point for points in tile_points for point in points},
+        key=lambda point: (point[1], point[0]),
+    )
+    coordinate_to_vertex: Dict[Tuple[float, float], int] = {
+        coordinate: i for i, coordinate in enumerate(vertex_coordinates)
+    }
+
+    tile_vertices = [
+        tuple(coordinate_to_vertex[point] for point in points) for points in tile_points
+    ]
+
+    vertex_tiles: List[List[int]] = [[] for _ in vertex_coordinates]
+    for tile_id, vertices in enumerate(tile_vertices):
+        for vertex_id in vertices:
+            vertex_tiles[vertex_id].append(tile_id)
+
+    # Consecutive corners of a hexagon are the edges of the graph
+    edge_set = set()
+    for vertices in tile_vertices:
+        for i in range(6):
+            a, b = vertices[i], vertices[(i + 1) % 6]
+            edge_set.add((min(a, b), max(a, b)))
+    edge_vertices = sorted(edge_set)
+
+    vertex_neighbors: List[List[int]] = [[] for _ in vertex_coordinates]
+    vertex_edges: List[List[int]] = [[] for _ in vertex_coordinates]
+    for edge_id, (a, b) in enumerate(edge_vertices):
+        vertex_neighbors[a].append(b)
+        vertex_neighbors[b].append(a)
+        vertex_edges[a].append(edge_id)
+        vertex_edges[b].append(edge_id)
+
+    # Tiles that share an edge (on a hex grid this is the same as sharing a vertex)
+    tile_neighbors: List[List[int]] = [[] for _ in tile_coordinates]
+    for tiles in vertex_tiles:
+        for a in tiles:
+            for b in tiles:
+                if a != b and b not in tile_neighbors[a]:
+                    tile_neighbors[a].append(b)
+
+    return (
+        tuple(tile_coordinates),
+        tuple(tile_centers),
+        tuple(tile_points),
+        tuple(tile_vertices),
+        tuple(tuple(sorted(neighbors)) for neighbors in tile_neighbors),
+        tuple(vertex_coordinates),
+        tuple(tuple(tiles) for tiles in vertex_tiles),
+        tuple(tuple(sorted(neighbors)) for neighbors in vertex_neighbors),
+        tuple(tuple(edges) for edges in vertex_edges),
+        tuple(edge_vertices),
+    )
+
+
+(
+    TILE_COORDINATES,
+    TILE_CENTERS,
+    TILE_POINTS,
+    TILE_VERTICES,
+    TILE_NEIGHBORS,
+    VERTEX_COORDINATES,
+    VERTEX_TILES,
+    VERTEX_NEIGHBORS,
+    VERTEX_EDGES,
+    EDGE_VERTICES,
+) = _build_topology()
+
+VERTEX_PORTS: Tuple[str, ...] = tuple(
+    Port.get_port(i + 1) for i in range(len(VERTEX_COORDINATES))
+)
+
+# Bit i set for vertex i and each of its neighbors, settling a vertex blocks all of them
+VERTEX_BLOCK_MASKS: Tuple[int, ...] = tuple(
+    (1 << i) | sum(1 << neighbor for neighbor in VERTEX_NEIGHBORS[i])
+    for i in range(len(VERTEX_COORDINATES))
+)
+
+NUM_TILES = len(TILE_COORDINATES)
+NUM_VERTICES = len(VERTEX_COORDINATES)
+NUM_EDGES = len(EDGE_VERTICES)
@@ -0,0 +1,303 @@
+"""
+Memory-mapped, append-only store of (observation, action mask, action, reward)
+steps for experience replay.
+
+Steps have one fixed NumPy record type (STEP_DTYPE): the flat int8 observation
+from vector_state (tile resources and numbers, vertex and edge owners, current
+player and phase), the legal action mask packed into bits, the action, the
+reward, the game it came from and whether it was the game's last step.
+
+Each writer appends to its own chunk files, so any number of processes can write
+into one directory without locking:
+
+    <writer>-<chunk>.npy     chunk_size steps, a regular .npy file opened as a memmap
+    <writer>-<chunk>.count   8 bytes, how many of those steps are written
+
+A step is written before the count that covers it, so readers in other processes
+only ever see whole steps. Full chunks are closed and a new one started; with
+max_chunks set, a writer deletes its oldest chunks past that number (rotation).
+
+Readers memory map every chunk read-only. Nothing is parsed or unpickled, a
+minibatch is one gather of the sampled rows straight from the page cache, and
+views() hands out the committed rows of each chunk without any copy.
+"""
+
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from actions import NUM_ACTIONS, ActionType, decode_action, road_action, settle_action
+from edge import Edge
+from features import PIP_SUM
+from game import Game
+from game_record import GameRecord
+from player import Player
+from policy import Policy
+from vector_state import OBSERVATION_SIZE, encode_game
+from vertex import Vertex
+
+PACKED_MASK_SIZE = (NUM_ACTIONS + 7) // 8
+STEP_DTYPE = np.dtype(
+    [
+        ("observation", np.int8, (OBSERVATION_SIZE,)),
+        ("action_mask", np.uint8, (PACKED_MASK_SIZE,)),
+        ("action", np.int16),
+        ("reward", np.float32),
+        ("game", np.uint64),
+        ("done", np.bool_),
+    ]
+)
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def unpack_masks(packed: np.ndarray) -> np.ndarray:
+    # (n, PACKED_MASK_SIZE) bits back to an (n, NUM_ACTIONS) bool mask
+    return np.unpackbits(packed, axis=-1, count=NUM_ACTIONS).astype(bool)
+
+
+def _fill_step(step: np.void, game: Game, action: int, mask: np.ndarray) -> None:
+    # The position before action is played, mask is scratch space for the legal moves
+    encode_game(game, step["observation"])
+    mask[:] = False
+    mask[game.get_legal_actions()] = True
+    step["action_mask"] = np.packbits(mask)
+    step["action"] = action
+    # The reward matches CatanEnv: the chance per roll that a new settlement
+    # produces, 0 otherwise
+    action_type, index = decode_action(action)
+    if action_type == ActionType.SETTLE:
+        step["reward"] = game.board.vertex_features[index, PIP_SUM] / 36
+
+
+def _finish_steps(steps: np.ndarray, seed: int) -> np.ndarray:
+    steps["game"] = seed
+    if len(steps):
+        steps[-1]["done"] = True
+    return steps
+
+
+def steps_from_record(record: GameRecord) -> np.ndarray:
+    # Every step of a recorded game, rebuilt by replaying it
+    game = Game(headless=True, seed=record.seed)
+    steps = np.zeros(len(record.actions), dtype=STEP_DTYPE)
+    mask = np.zeros(NUM_ACTIONS, dtype=bool)
+    for i, action in enumerate(record.actions):
+        _fill_step(steps[i], game, action, mask)
+        game.apply_action(action)
+
+    return _finish_steps(steps, record.seed)
+
+
+class StepRecorder:
+    """
+    Collects a game's steps while it is played, no replay needed. Every seat's
+    policy is wrapped with wrap(), which records each decision before the game
+    applies it, and take() hands out the finished game's steps.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.steps = np.zeros(capacity, dtype=STEP_DTYPE)
+        self.count = 0
+        self._mask = np.zeros(NUM_ACTIONS, dtype=bool)
+
+    def wrap(self, policy: Policy) -> "RecordingPolicy":
+        return RecordingPolicy(policy, self)
+
+    def record(self, game: Game, action: int) -> None:
+        if self.count == len(self.steps):
+            self.steps = np.concatenate([self.steps, np.zeros_like(self.steps)])
+        _fill_step(self.steps[self.count], game, action, self._mask)
+        self.count += 1
+
+    def take(self, seed: int) -> np.ndarray:
+        # The steps so far as their own array, the recorder starts over empty
+        steps = _finish_steps(self.steps[: self.count].copy(), seed)
+        self.steps[: self.count] = 0
+        self.count = 0
+        return steps
+
+
+class RecordingPolicy:
+    # Not a Policy subclass, so profiling keeps timing only the wrapped decisions
+    def __init__(self, policy: Policy, recorder: StepRecorder):
+        self.policy = policy
+        self.recorder = recorder
+
+    def choose_settlement(self, game: Game, player: Player) -> Vertex:
+        vertex = self.policy.choose_settlement(game, player)
+        self.recorder.record(game, settle_action(vertex.id))
+        return vertex
+
+    def choose_road(self, game: Game, player: Player, vertex: Vertex) -> Edge:
+        edge = self.policy.choose_road(game, player, vertex)
+        self.recorder.record(game, road_action(edge.id))
+        return edge
+
+
+class _Chunk:
+    def __init__(self, path: str, chunk_size: Optional[int] = None):
+        """
+        Creates the chunk when given a size, otherwise opens an existing one read-only
+        """
+        self.path = path
+        count_path = path[: -len(".npy")] + ".count"
+        if chunk_size is None:
+            self.steps = np.load(path, mmap_mode="r")
+            self.count = np.memmap(count_path, dtype=np.int64, mode="r", shape=(1,))
+        else:
+            self.steps = np.lib.format.open_memmap(
+                path, mode="w+", dtype=STEP_DTYPE, shape=(chunk_size,)
+            )
+            self.count = np.memmap(count_path, dtype=np.int64, mode="w+", shape=(1,))
+
+    @property
+    def committed(self) -> int:
+        return int(self.count[0])
+
+    def delete(self) -> None:
+        for path in (self.path, self.path[: -len(".npy")] + ".count"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class TrajectoryWriter:
+    def __init__(
+        self,
+        directory: str,
+        writer_id: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_chunks: Optional[int] = None,
+    ):
+        """
+        writer_id has to be unique among the writers sharing the directory, by
+        default it comes from the process id and the start time
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.writer_id = writer_id or f"{os.getpid()}_{time.time_ns()}"
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.chunks: List[_Chunk] = []
+        self.position = 0
+        self._next_chunk = 0
+        self._start_chunk()
+
+    def _start_chunk(self) -> None:
+        if self.chunks:
+            self.chunks[-1].steps.flush()
+        path = os.path.join(
+            self.directory, f"{self.writer_id}-{self._next_chunk:06d}.npy"
+        )
+        self._next_chunk += 1
+        self.chunks.append(_Chunk(path, self.chunk_size))
+        self.position = 0
+
+        # Rotation, the oldest chunks go first
+        while self.max_chunks and len(self.chunks) > self.max_chunks:
+            self.chunks.pop(0).delete()
+
+    def append(self, steps: np.ndarray) -> None:
+        """
+        Append STEP_DTYPE rows. They become visible to readers all at once, chunk by
+        chunk, when the count is bumped after they are copied in.
+        """
+        written = 0
+        while written < len(steps):
+            if self.position == self.chunk_size:
+                self._start_chunk()
+            chunk = self.chunks[-1]
+            n = min(len(steps) - written, self.chunk_size - self.position)
+            chunk.steps[self.position : self.position + n] = steps[
+                written : written + n
+            ]
+            self.position += n
+            chunk.count[0] = self.position
+            written += n
+
+    def append_record(self, record: GameRecord) -> None:
+        self.append(steps_from_record(record))
+
+    def flush(self) -> None:
+        # Only needed for durability, readers see appended steps straight away
+        chunk = self.chunks[-1]
+        chunk.steps.flush()
+        chunk.count.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.chunks = []
+
+    def __enter__(self) -> "TrajectoryWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class TrajectoryReader:
+    def __init__(self, directory: str, seed: Optional[int] = None):
+        self.directory = directory
+        self.rng = np.random.default_rng(seed)
+        self.chunks: Dict[str, _Chunk] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Pick up chunks started since the last refresh and drop rotated ones. Steps
+        appended to chunks that are already open show up without a refresh.
+        """
+        paths = {
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".npy")
+        }
+        for path in set(self.chunks) - paths:
+            del self.chunks[path]
+        for path in sorted(paths - set(self.chunks)):
+            try:
+                self.chunks[path] = _Chunk(path)
+            except (FileNotFoundError, ValueError):
+                # Rotated away or still being created, the next refresh retries
+                pass
+
+    def _counts(self) -> Tuple[List[_Chunk], np.ndarray]:
+        chunks = list(self.chunks.values())
+        return chunks, np.array([chunk.committed for chunk in chunks], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self._counts()[1].sum())
+
+    def views(self) -> Iterator[np.ndarray]:
+        # The committed steps of every chunk, as read-only views of the files
+        for chunk in list(self.chunks.values()):
+            yield chunk.steps[: chunk.committed]
+
+    def sample(self, batch_size: int) -> np.ndarray:
+        """
+        batch_size steps drawn uniformly with replacement from everything committed
+        """
+        chunks, counts = self._counts()
+        total = counts.sum()
+        if total == 0:
+            raise ValueError("The trajectory store is empty")
+
+        indices = self.rng.integers(total, size=batch_size)
+        ends = np.cumsum(counts)
+        chunk_of = np.searchsorted(ends, indices, side="right")
+        offsets = indices - (ends - counts)[chunk_of]
+
+        batch = np.empty(batch_size, dtype=STEP_DTYPE)
+        for chunk_index in np.unique(chunk_of):
+            rows = chunk_of == chunk_index
+            batch[rows] = chunks[chunk_index].steps[offsets[rows]]
+        return batch
+
+
+def write_records(
+    directory: str, records: Sequence[GameRecord], **writer_options
+) -> None:
+    with TrajectoryWriter(directory, **writer_options) as writer:
+        for record in records:
+            writer.append_record(record)
@@ -0,0 +1,82 @@
+"""
+Bounded cache keyed by Zobrist hash.
+
+Positions reached by different move orders (or in different games on the same
+layout) share a hash, so anything computed from a position alone, like a rollout
+evaluation or a heuristic pick, can be looked up instead of recomputed.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+EVICTION_POLICIES = ("lru", "fifo")
+
+
+class TranspositionTable:
+    def __init__(self, capacity: int = 1 << 16, eviction: str = "lru"):
+        """
+        Holds at most capacity entries. When full, "lru" drops the entry used least
+        recently and "fifo" the one stored first.
+        """
+        if capacity < 1:
+            raise ValueError("A transposition table needs a capacity of at least 1")
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(
+                f"Unknown eviction policy {eviction!r}, use one of {EVICTION_POLICIES}"
+            )
+        self.capacity = capacity
+        self.eviction = eviction
+        self.entries: "OrderedDict[int, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.entries
+
+    def get(self, key: int, default: Optional[Any] = None) -> Any:
+        entry = self.entries.get(key, self)
+        if entry is self:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        if self.eviction == "lru":
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: int, value: Any) -> None:
+        if key in self.entries:
+            if self.eviction == "lru":
+                self.entries.move_to_end(key)
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = value
+
+    def get_or_compute(self, key: int, compute: Callable[[], Any]) -> Any:
+        entry = self.get(key, self)
+        if entry is self:
+            entry = compute()
+            self.put(key, entry)
+        return entry
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"TranspositionTable({len(self)}/{self.capacity}, {self.eviction}, "
+            f"hits={self.hits}, misses={self.misses}, evictions={self.evictions})"
+        )
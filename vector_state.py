@@ -0,0 +1,283 @@
+"""
+Array-backed game state for running many games side by side.
+
+Every field is a NumPy array whose first axis is the game, so a whole batch of
+games is stepped with a handful of vectorized operations instead of walking
+Vertex/Edge objects. Players are stored by index (Player.id - 1) and an empty
+vertex or edge has owner -1.
+"""
+
+from typing import Optional, Sequence
+import numpy as np
+from constants import (
+    NUM_RESOURCE_TYPES,
+    RESOURCE_IDS,
+    Building,
+    GamePhase,
+    Resource,
+)
+from layout import BoardLayout
+from topology import (
+    EDGE_VERTICES,
+    NUM_EDGES,
+    NUM_TILES,
+    NUM_VERTICES,
+    VERTEX_EDGES,
+    VERTEX_NEIGHBORS,
+    VERTEX_TILES,
+)
+
+NUM_PLAYERS = 4
+NO_OWNER = -1
+
+
+def _padded(table, width: int, fill: int) -> np.ndarray:
+    # Ragged adjacency tuples as a rectangular array, short rows point at `fill`
+    result = np.full((len(table), width), fill, dtype=np.intp)
+    for i, row in enumerate(table):
+        result[i, : len(row)] = row
+    return result
+
+
+# Padding points one past the end, at a slot that is always empty / -1
+VERTEX_NEIGHBOR_TABLE = _padded(VERTEX_NEIGHBORS, 3, NUM_VERTICES)
+VERTEX_EDGE_TABLE = _padded(VERTEX_EDGES, 3, NUM_EDGES)
+VERTEX_TILE_TABLE = _padded(VERTEX_TILES, 3, NUM_TILES)
+EDGE_VERTEX_TABLE = np.array(EDGE_VERTICES, dtype=np.intp)
+
+# Flat int8 observation, fields are laid out back to back in this order
+OBSERVATION_FIELDS = (
+    ("tile_resource", NUM_TILES),
+    ("tile_number", NUM_TILES),
+    ("vertex_owner", NUM_VERTICES),
+    ("vertex_building", NUM_VERTICES),
+    ("edge_owner", NUM_EDGES),
+    ("current_player", 1),
+    ("game_phase", 1),
+)
+OBSERVATION_SLICES = {}
+_offset = 0
+for _name, _size in OBSERVATION_FIELDS:
+    OBSERVATION_SLICES[_name] = slice(_offset, _offset + _size)
+    _offset += _size
+OBSERVATION_SIZE = _offset
+
+
+def encode_game(game: "Game", observation: np.ndarray) -> None:  # type: ignore # noqa: F821
+    """
+    Write one object based game into an OBSERVATION_SIZE row, e.g. a row of a
+    batch buffer, in the same layout as BatchedGameState.observations()
+    """
+    layout = game.board.layout
+    observation[OBSERVATION_SLICES["tile_resource"]] = [
+        RESOURCE_IDS[resource] for resource in layout.resources
+    ]
+    observation[OBSERVATION_SLICES["tile_number"]] = layout.numbers
+
+    vertex_owner = observation[OBSERVATION_SLICES["vertex_owner"]]
+    vertex_building = observation[OBSERVATION_SLICES["vertex_building"]]
+    vertex_owner[:] = NO_OWNER
+    vertex_building[:] = Building.NONE.value
+    for vertex in game.board.vertices:
+        if vertex.settlement:
+            vertex_owner[vertex.id] = vertex.settlement.id - 1
+            vertex_building[vertex.id] = (
+                Building.CITY.value if vertex.is_city else Building.SETTLEMENT.value
+            )
+
+    edge_owner = observation[OBSERVATION_SLICES["edge_owner"]]
+    edge_owner[:] = NO_OWNER
+    for edge in game.board.edges:
+        if edge.road:
+            edge_owner[edge.id] = edge.road.id - 1
+
+    observation[OBSERVATION_SLICES["current_player"]] = game.current_player_index
+    observation[OBSERVATION_SLICES["game_phase"]] = game.game_phase
+
+
+class BatchedGameState:
+    def __init__(self, n_games: int):
+        self.tile_resource = np.full(
+            (n_games, NUM_TILES), RESOURCE_IDS[Resource.DESERT.value], dtype=np.int8
+        )
+        self.tile_number = np.full((n_games, NUM_TILES), -1, dtype=np.int8)
+        self.vertex_owner = np.full((n_games, NUM_VERTICES), NO_OWNER, dtype=np.int8)
+        self.vertex_building = np.full(
+            (n_games, NUM_VERTICES), Building.NONE.value, dtype=np.int8
+        )
+        self.edge_owner = np.full((n_games, NUM_EDGES), NO_OWNER, dtype=np.int8)
+        self.player_resources = np.zeros(
+            (n_games, NUM_PLAYERS, NUM_RESOURCE_TYPES), dtype=np.int16
+        )
+        self.current_player = np.zeros(n_games, dtype=np.int8)
+        self.number_of_turns = np.zeros(n_games, dtype=np.int16)
+        self.game_phase = np.full(n_games, GamePhase.SETTLEMENT_0.value, dtype=np.int8)
+        # Vertex settled this turn, the setup road has to touch it
+        self.current_vertex = np.full(n_games, -1, dtype=np.int16)
+
+    @property
+    def n_games(self) -> int:
+        return self.vertex_owner.shape[0]
+
+    @classmethod
+    def from_layouts(cls, layouts: Sequence[BoardLayout]) -> "BatchedGameState":
+        state = cls(len(layouts))
+        state.set_layouts(np.arange(len(layouts)), layouts)
+        return state
+
+    @classmethod
+    def from_games(cls, games: Sequence["Game"]) -> "BatchedGameState":  # type: ignore # noqa: F821
+        """
+        Copy the state of object based games into a new batch
+        """
+        state = cls.from_layouts([game.board.layout for game in games])
+        for i, game in enumerate(games):
+            for vertex in game.board.vertices:
+                if vertex.settlement:
+                    state.vertex_owner[i, vertex.id] = vertex.settlement.id - 1
+                    state.vertex_building[i, vertex.id] = (
+                        Building.CITY.value
+                        if vertex.is_city
+                        else Building.SETTLEMENT.value
+                    )
+            for edge in game.board.edges:
+                if edge.road:
+                    state.edge_owner[i, edge.id] = edge.road.id - 1
+            state.player_resources[i] = [player.resources for player in game.players]
+            state.current_player[i] = game.current_player_index
+            state.number_of_turns[i] = game.number_of_turns
+            state.game_phase[i] = game.game_phase
+            if game.current_vertex is not None:
+                state.current_vertex[i] = game.current_vertex.id
+
+        return state
+
+    def observations(self) -> np.ndarray:
+        """
+        (n_games, OBSERVATION_SIZE) int8 encoding of every game
+        """
+        return np.concatenate(
+            [
+                getattr(self, name).reshape(self.n_games, size).astype(np.int8)
+                for name, size in OBSERVATION_FIELDS
+            ],
+            axis=1,
+        )
+
+    def set_layouts(self, games: np.ndarray, layouts: Sequence[BoardLayout]) -> None:
+        """
+        Start fresh games with the given layouts at the given batch indices
+        """
+        self.tile_resource[games] = [
+            [RESOURCE_IDS[resource] for resource in layout.resources]
+            for layout in layouts
+        ]
+        self.tile_number[games] = [layout.numbers for layout in layouts]
+        self.vertex_owner[games] = NO_OWNER
+        self.vertex_building[games] = Building.NONE.value
+        self.edge_owner[games] = NO_OWNER
+        self.player_resources[games] = 0
+        self.current_player[games] = 0
+        self.number_of_turns[games] = 0
+        self.game_phase[games] = GamePhase.SETTLEMENT_0.value
+        self.current_vertex[games] = -1
+
+    def settleable_mask(self) -> np.ndarray:
+        """
+        (n_games, 54) mask of empty vertices with no settled neighbor
+        """
+        occupied = self.vertex_owner != NO_OWNER
+        padded = np.pad(occupied, ((0, 0), (0, 1)))
+        return ~(occupied | padded[:, VERTEX_NEIGHBOR_TABLE].any(axis=2))
+
+    def setup_road_mask(self) -> np.ndarray:
+        """
+        (n_games, 72) mask of empty edges touching the vertex settled this turn
+        """
+        mask = np.zeros((self.n_games, NUM_EDGES + 1), dtype=bool)
+        games = np.flatnonzero(
+            (self.game_phase == GamePhase.SETTLEMENT_1.value)
+            & (self.current_vertex >= 0)
+        )
+        edges = VERTEX_EDGE_TABLE[self.current_vertex[games]]
+        mask[games[:, None], edges] = True
+        mask = mask[:, :NUM_EDGES]
+        return mask & (self.edge_owner == NO_OWNER)
+
+    def build_settlements(
+        self,
+        games: np.ndarray,
+        vertices: np.ndarray,
+        players: Optional[np.ndarray] = None,
+    ) -> None:
+        if players is None:
+            players = self.current_player[games]
+        self.vertex_owner[games, vertices] = players
+        self.vertex_building[games, vertices] = Building.SETTLEMENT.value
+
+    def build_cities(self, games: np.ndarray, vertices: np.ndarray) -> None:
+        self.vertex_building[games, vertices] = Building.CITY.value
+
+    def build_roads(
+        self,
+        games: np.ndarray,
+        edges: np.ndarray,
+        players: Optional[np.ndarray] = None,
+    ) -> None:
+        if players is None:
+            players = self.current_player[games]
+        self.edge_owner[games, edges] = players
+
+    def step_settlement_phase(self, actions: np.ndarray) -> None:
+        """
+        Step every game still in the settlement phase at once. The action of a game
+        is a vertex id while it is settling and an edge id while it is building its
+        road, games that are past the settlement phase are left alone.
+        """
+        games = np.arange(self.n_games)
+        settling = self.game_phase == GamePhase.SETTLEMENT_0.value
+        building = self.game_phase == GamePhase.SETTLEMENT_1.value
+
+        self.build_settlements(games[settling], actions[settling])
+        self.current_vertex[settling] = actions[settling]
+        self.game_phase[settling] = GamePhase.SETTLEMENT_1.value
+
+        self.build_roads(games[building], actions[building])
+        self.game_phase[building] = GamePhase.SETTLEMENT_0.value
+        self.advance_turns(building)
+
+    def advance_turns(self, games: np.ndarray) -> None:
+        # Snake draft: players 0-3 settle, then 3-0
+        turns = self.number_of_turns[games] + 1
+        self.number_of_turns[games] = turns
+        self.current_player[games] = np.where(
+            turns > 7,
+            self.current_player[games],
+            np.where(turns > 3, 7 - turns, turns),
+        )
+        self.game_phase[games] = np.where(
+            turns > 7, GamePhase.NON_SETTLEMENT.value, self.game_phase[games]
+        )
+
+    def produce(self, rolls: np.ndarray) -> None:
+        """
+        Pay out resources for one dice roll per game, settlements get one card and
+        cities two
+        """
+        hit = np.pad(self.tile_number == rolls[:, None], ((0, 0), (0, 1)))
+        resource = np.pad(self.tile_resource, ((0, 0), (0, 1)))
+
+        # (n_games, 54, 3) view of every vertex's tiles
+        vertex_hit = (
+            hit[:, VERTEX_TILE_TABLE] & (self.vertex_owner != NO_OWNER)[:, :, None]
+        )
+        games, vertices, slots = np.nonzero(vertex_hit)
+        np.add.at(
+            self.player_resources,
+            (
+                games,
+                self.vertex_owner[games, vertices],
+                resource[games, VERTEX_TILE_TABLE[vertices, slots]],
+            ),
+            self.vertex_building[games, vertices],
+        )
@@ -1,43 +1,42 @@
-import math
-from typing import List, Set, Tuple
-from constants import HEX_SIZE, Port
-from edge import Edge
+from typing import List, Tuple
+from constants import Port
+from profiling import profiled
+from topology import VERTEX_COORDINATES
 
 
 class Vertex:
-    def __init__(self, coordinate: Tuple[float, float]):
-        self.coordinate = coordinate
-        self.neighbors: Set[Vertex] = set()
+    # Vertices are identified by their topology id, the same on every board
+    __slots__ = (
+        "id",
+        "neighbors",
+        "name",
+        "tile_association",
+        "port",
+        "settlement",
+        "is_city",
+    )
+
+    def __init__(self, id: int):
+        self.id = id
+        self.neighbors: List[Vertex] = []
         self.name = ""
         self.tile_association: List["Tile"] = []  # type: ignore # noqa: F821
         self.port = None
         self.settlement = None
+        self.is_city = False
 
     def __eq__(self, other):
         if not isinstance(other, Vertex):
             return False
-        return self.coordinate == other.coordinate
+        return self.id == other.id
 
     def __hash__(self):
-        return hash(self.coordinate)
-
-    def find_all_neighbors(
-        self, set_of_other_vertices: Set["Vertex"], list_of_edges: List[Edge]
-    ) -> None:
-        """
-        For generating all edges to neighboring vertices
-        """
-        epsilon = 1
-        for vertice in set_of_other_vertices:
-            distance = math.sqrt(
-                (vertice.coordinate[0] - self.coordinate[0]) ** 2
-                + (vertice.coordinate[1] - self.coordinate[1]) ** 2
-            )
-
-            if distance - HEX_SIZE < epsilon and distance != 0:
-                self.neighbors.add(vertice)
+        return self.id
 
-                Edge.generate_new_edge((vertice, self), list_of_edges)
+    @property
+    def coordinate(self) -> Tuple[float, float]:
+        # Pixel position, only drawing and click testing need it
+        return VERTEX_COORDINATES[self.id]
 
     def label_vertex(self, i: int) -> None:
         """
@@ -46,17 +45,17 @@ class Vertex:
         self.name = f"v{i}"
         self.port = Port.get_port(i)
 
-    def add_tile_association(self, points, Tile: "Tile") -> None:  # type: ignore # noqa: F821
-        """
-        Get all tiles the vertex is associated with
-        """
-        for point in points:
-            if self.coordinate == point:
-                self.tile_association.append(Tile)
-
+    @profiled("board.vertex.build_settlement")
     def build_settlement(self, player) -> None:
         self.settlement = player
 
+    @profiled("board.vertex.build_city")
+    def build_city(self, player) -> None:
+        # Cities replace one of the player's own settlements
+        self.settlement = player
+        self.is_city = True
+
+    @profiled("board.vertex.can_settle")
     def check_if_can_build_settlement(self) -> None:
         # If vertex already has a settlement then you cannot build another
         if self.settlement:
@@ -0,0 +1,62 @@
+"""
+Zobrist hashing of game positions.
+
+Every piece of state (a tile's resource and number, a building or road owned by a
+player, a player's card count, whose turn it is) has its own random 64 bit key, and
+a position hashes to the XOR of the keys of everything in it. Changing one thing
+only XORs its old key out and its new key in, so the board keeps its hash up to date
+with every move instead of rehashing. The keys come from a fixed seed, so hashes are
+the same in every process and every run.
+"""
+
+import random
+from typing import List
+from constants import NUMBER_DICT, RESOURCE_IDS
+from topology import NUM_EDGES, NUM_TILES, NUM_VERTICES
+
+NUM_PLAYERS = 4
+NUM_PHASES = 3
+ZOBRIST_SEED = 0x5EED_CA7A_2025
+MASK_64 = (1 << 64) - 1
+
+_rng = random.Random(ZOBRIST_SEED)
+
+
+def _keys(*shape: int):
+    if len(shape) == 1:
+        return [_rng.getrandbits(64) for _ in range(shape[0])]
+    return [_keys(*shape[1:]) for _ in range(shape[0])]
+
+
+TILE_RESOURCE_KEYS: List[List[int]] = _keys(NUM_TILES, len(RESOURCE_IDS))
+# Indexed by the number on the tile, the desert's -1 lands on the last slot
+TILE_NUMBER_KEYS: List[List[int]] = _keys(NUM_TILES, max(NUMBER_DICT) + 2)
+SETTLEMENT_KEYS: List[List[int]] = _keys(NUM_VERTICES, NUM_PLAYERS)
+CITY_KEYS: List[List[int]] = _keys(NUM_VERTICES, NUM_PLAYERS)
+ROAD_KEYS: List[List[int]] = _keys(NUM_EDGES, NUM_PLAYERS)
+PLAYER_TO_MOVE_KEYS: List[int] = _keys(NUM_PLAYERS)
+PHASE_KEYS: List[int] = _keys(NUM_PHASES)
+# The settlement the pending setup road has to come off
+CURRENT_VERTEX_KEYS: List[int] = _keys(NUM_VERTICES)
+_CARD_KEYS: List[List[int]] = _keys(NUM_PLAYERS, len(RESOURCE_IDS))
+
+
+def card_count_key(player: int, resource: int, count: int) -> int:
+    """
+    Card counts have no upper bound, so their keys are mixed from the count
+    (splitmix64) instead of looked up. Holding no cards hashes to 0.
+    """
+    if count == 0:
+        return 0
+    x = (_CARD_KEYS[player][resource] + count * 0x9E3779B97F4A7C15) & MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return x ^ (x >> 31)
+
+
+def layout_hash(resources, numbers) -> int:
+    h = 0
+    for tile_id in range(NUM_TILES):
+        h ^= TILE_RESOURCE_KEYS[tile_id][RESOURCE_IDS[resources[tile_id]]]
+        h ^= TILE_NUMBER_KEYS[tile_id][numbers[tile_id]]
+    return h